@@ -0,0 +1,161 @@
+import os
+import time
+import threading
+from collections import deque
+
+
+class CircuitOpenError(RuntimeError):
+    '''Raised when a call is refused because its circuit is open'''
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuito {name} abierto, reintentar en {retry_after:.0f} s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    '''Circuit breaker for one provider endpoint.
+
+    closed: calls go through; the outcome of the last `window` calls is kept.
+    Once there are at least `min_calls` of them and the share of failures
+    (errors, 5xx/429 or calls slower than `slow_call` seconds) reaches
+    `error_rate`, the circuit opens.
+    open: calls fail fast with CircuitOpenError for `open_seconds`.
+    half_open: a single probe call is let through; if it succeeds the
+    circuit closes again, otherwise it goes back to open.'''
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+            self,
+            name: str,
+            window: int = 20,
+            min_calls: int = 10,
+            error_rate: float = 0.5,
+            slow_call: float = 30.0,
+            open_seconds: float = 60.0
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call = slow_call
+        self.open_seconds = open_seconds
+
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.results = deque(maxlen=window)
+        self.times_opened = 0
+
+        self._lock = threading.Lock()
+        self._probing = False
+
+
+    def before_call(self) -> None:
+        '''Check if a call may go through. Raises CircuitOpenError if not.'''
+
+        with self._lock:
+            if self.state == self.OPEN:
+                remaining = self.opened_at + self.open_seconds - time.monotonic()
+                if remaining > 0:
+                    raise CircuitOpenError(self.name, remaining)
+
+                # Cool-down elapsed: let a probe through
+                self.state = self.HALF_OPEN
+                self._probing = False
+
+            if self.state == self.HALF_OPEN:
+                if self._probing:
+                    # A probe is already running, wait for its outcome
+                    raise CircuitOpenError(self.name, 1.0)
+                self._probing = True
+
+
+    def record(self, success: bool, latency: float) -> None:
+        '''Record the outcome of a call that went through'''
+
+        failed = not success or (self.slow_call > 0 and latency > self.slow_call)
+
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probing = False
+
+                if failed:
+                    self._open()
+                else:
+                    print(f"Circuito {self.name} cerrado nuevamente")
+                    self.state = self.CLOSED
+                    self.results.clear()
+                return
+
+            self.results.append(failed)
+
+            if len(self.results) >= self.min_calls:
+                if sum(self.results) / len(self.results) >= self.error_rate:
+                    self._open()
+
+
+    def _open(self) -> None:
+        '''Open the circuit. Must hold the lock.'''
+
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+        self.results.clear()
+        print(f"Circuito {self.name} abierto por {self.open_seconds:.0f} s")
+
+
+    def retry_after(self) -> float:
+        '''Seconds until the next probe is allowed (0 if not open)'''
+
+        with self._lock:
+            if self.state != self.OPEN:
+                return 0.0
+            return max(0.0, self.opened_at + self.open_seconds - time.monotonic())
+
+
+class CircuitBreakerRegistry:
+    '''One circuit breaker per endpoint of a provider, created on demand'''
+
+    def __init__(self, provider: str, **config):
+        self.provider = provider
+        self.config = config
+        self.breakers = {}
+        self._lock = threading.Lock()
+
+
+    def get(self, endpoint: str) -> CircuitBreaker:
+        with self._lock:
+            if endpoint not in self.breakers:
+                self.breakers[endpoint] = CircuitBreaker(f"{self.provider}/{endpoint}", **self.config)
+            return self.breakers[endpoint]
+
+
+    def stats(self) -> dict:
+        '''Return the state of every endpoint circuit'''
+
+        with self._lock:
+            return {
+                endpoint: {"state": breaker.state, "times_opened": breaker.times_opened}
+                for endpoint, breaker in self.breakers.items()
+            }
+
+
+def build_circuit_breakers(provider: str) -> CircuitBreakerRegistry:
+    '''Create the circuit breakers of a provider from the environment.
+
+    CIRCUIT_WINDOW: recent calls considered (default 20)
+    CIRCUIT_MIN_CALLS: calls needed before the circuit can open (default 10)
+    CIRCUIT_ERROR_RATE: share of failures that opens the circuit (default 0.5)
+    CIRCUIT_SLOW_CALL: seconds after which a call counts as failed (default 30, 0 disables)
+    CIRCUIT_OPEN_SECONDS: seconds the circuit stays open (default 60)'''
+
+    return CircuitBreakerRegistry(
+        provider,
+        window=int(os.getenv("CIRCUIT_WINDOW", "20")),
+        min_calls=int(os.getenv("CIRCUIT_MIN_CALLS", "10")),
+        error_rate=float(os.getenv("CIRCUIT_ERROR_RATE", "0.5")),
+        slow_call=float(os.getenv("CIRCUIT_SLOW_CALL", "30")),
+        open_seconds=float(os.getenv("CIRCUIT_OPEN_SECONDS", "60"))
+    )
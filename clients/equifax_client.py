@@ -4,6 +4,12 @@ import json
 import requests
 from typing import Optional
 from requests.auth import HTTPBasicAuth
+from clients.http_transport import HttpTransport, build_transport
+from clients.rate_limiter import build_rate_limiter
+from clients.token_manager import TokenManager
+from clients.payload_archive import replay_enabled
+from library.rut import normalize_rut
+from library.equifax_components import NATURAL, ContactData, extract_contacts_from_bytes
 
 class EquifaxClient:
     def __init__(
@@ -16,7 +22,8 @@ class EquifaxClient:
             password_juridca: str,
             token_natural: str,
             token_juridica: str,
-            scope: str
+            scope: str,
+            transport: Optional[HttpTransport] = None
     ):
         self.login_url = login_url
         self.request_url = request_url
@@ -27,46 +34,45 @@ class EquifaxClient:
         self.token_natural = token_natural
         self.token_juridica = token_juridica
         self.scope = scope
+        self.token_manager = None
 
+        # Pooled session shared by the token and report calls
+        self.transport = transport if transport else build_transport(
+            default_headers={
+                "Content-Type": "application/json"
+            },
+            rate_limiter=build_rate_limiter("EQUIFAX", 5, 5),
+            provider="EQUIFAX"
+        )
 
-    def obtain_token_person(self) -> str:
-        '''Obtain token that allows to request a report for a person'''
-        
-        # Basic authentication (user and password)
-        auth = HTTPBasicAuth(self.user_natural, self.password_natural)
-        
-        # Add headers
-        headers = {
-            'Content-Type': 'application/x-www-form-urlencoded'
+        # Each kind of report has its own token and its own limit, on top of
+        # the provider limit (EQUIFAX_NATURAL_RATE_LIMIT, EQUIFAX_JURIDICA_RATE_LIMIT)
+        self.report_limiters = {
+            "natural": build_rate_limiter("EQUIFAX_NATURAL", 2.5, 5),
+            "juridica": build_rate_limiter("EQUIFAX_JURIDICA", 2.5, 5)
         }
 
-        # Add data for the POST
-        data = {
-            'scope': f'{self.scope}',
-            'grant_type': 'client_credentials'
-        }
 
-        # Call the service
-        response = requests.post(self.login_url, auth=auth, headers=headers, data=data)
-        
-        # Raise an error if the request failed
-        response.raise_for_status()
-
-        # Extract the access token
-        token = response.json().get('access_token')
-
-        if not token:
-            raise ValueError("No se pudo obtener un token.")
+    def obtain_token_person(self) -> str:
+        '''Obtain token that allows to request a report for a person'''
 
+        token, _ = self._request_token(self.user_natural, self.password_natural)
         return token
 
 
     def obtain_token_corporation(self) -> str:
         '''Obtain token that allows to request a report for a corporation'''
-        
 
+        token, _ = self._request_token(self.user_juridica, self.password_juridica)
+        return token
+
+
+    def _request_token(self, user: str, password: str) -> tuple[str, int]:
+        '''Authenticate with the given credentials.
+        Returns the access token and its lifetime in seconds.'''
+        
         # Basic authentication (user and password)
-        auth = HTTPBasicAuth(self.user_juridica, self.password_juridica)
+        auth = HTTPBasicAuth(user, password)
         
         # Add headers
         headers = {
@@ -79,49 +85,134 @@ class EquifaxClient:
             'grant_type': 'client_credentials'
         }
 
-        # Call the service
-        response = requests.post(self.login_url, auth=auth, headers=headers, data=data)
+        # Call the service (client credentials grant, safe to retry)
+        response = self.transport.post(
+            self.login_url,
+            auth=auth,
+            headers=headers,
+            data=data,
+            idempotent=True,
+            endpoint="token"
+        )
         
         # Raise an error if the request failed
         response.raise_for_status()
 
-        # Extract the access token
-        token = response.json().get('access_token')
+        # Extract the access token and its lifetime (one hour if not informed)
+        body = self.transport.json(response, "token")
+        token = body.get('access_token')
+        expires_in = int(body.get('expires_in') or 3600)
 
         if not token:
-            raise ValueError("No pudo obtener un token.")
+            raise ValueError("No se pudo obtener un token.")
 
-        return token
+        return token, expires_in
 
 
     def set_token_origin(self, origin: str = "env") -> bool:
         '''Determine where to get the tokens from. Options are:
         
         'env': reads them from the environment variables (fixed)
-        'auth': authenticates with user and password (dynamic)'''
+        'auth': authenticates with user and password (dynamic). The tokens
+        are cached until shortly before they expire and refreshed in the
+        background. If EQUIFAX_TOKEN_CACHE is set, they are also persisted
+        to that file and reused by the next run.'''
         
         if origin == "env":
+            self.token_manager = None
             self.token_natural = os.getenv("TOKEN_INTERNO_NATURAL")
             self.token_juridica = os.getenv("TOKEN_INTERNO_JURIDICA")
         
         elif origin == "auth":
-            self.token_natural = self.obtain_token_person()
-            self.token_juridica = self.obtain_token_corporation()
+            if self.token_manager is None:
+                self.token_manager = TokenManager(
+                    fetchers={
+                        "natural": lambda: self._request_token(self.user_natural, self.password_natural),
+                        "juridica": lambda: self._request_token(self.user_juridica, self.password_juridica)
+                    },
+                    cache_file=os.getenv("EQUIFAX_TOKEN_CACHE"),
+                    refresh_margin=int(os.getenv("EQUIFAX_TOKEN_MARGIN", "60"))
+                )
+
+            self.token_natural = self.token_manager.get("natural")
+            self.token_juridica = self.token_manager.get("juridica")
+            self.token_manager.start_background_refresh()
 
         else:
             raise RuntimeError(
                 f"Option {origin} not recognized for origin."
             )
+
+
+    def _get_token(self, kind: str) -> str:
+        '''Return the current token for "natural" or "juridica"'''
+
+        if self.token_manager is not None:
+            token = self.token_manager.get(kind)
+            setattr(self, f"token_{kind}", token)
+            return token
+
+        return getattr(self, f"token_{kind}")
+
+
+    def _post_report(self, kind: str, payload: dict, raw: bool = False) -> dict:
+        '''Send a report request with the token of the given kind.
+        With dynamic tokens, a 401 refreshes the token and retries once.
+        Returns the decoded report, or its raw bytes with raw.'''
+
+        # The archived reports are keyed by RUT
+        rut = payload["applicants"]["primaryConsumer"]["personalInformation"]["chileanRut"]
+        archive_key = normalize_rut(rut)
+
+        # Replayed reports need no token, and aren't limited
+        replay = replay_enabled()
+        token = self._get_token(kind) if not replay else None
+
+        if not replay:
+            self.report_limiters[kind].acquire()
+
+        # Send request. Reports are queries, so the POST is safe to retry
+        response = self.transport.post(
+            self.request_url,
+            headers={"Authorization": f"Bearer {token}"},
+            json=payload,
+            idempotent=True,
+            endpoint=f"report_{kind}",
+            archive_key=archive_key
+        )
+
+        # The token expired or was revoked: get a new one and retry once
+        if response.status_code == 401 and self.token_manager is not None:
+            token = self.token_manager.invalidate(kind, token)
+            setattr(self, f"token_{kind}", token)
+            self.report_limiters[kind].acquire()
+
+            response = self.transport.post(
+                self.request_url,
+                headers={"Authorization": f"Bearer {token}"},
+                json=payload,
+                idempotent=True,
+                endpoint=f"report_{kind}",
+                archive_key=archive_key
+            )
+
+        # Raise for status, obtain response and return
+        response.raise_for_status()
+
+        if raw:
+            return response.content
+        return self.transport.json(response, f"report_{kind}")
         
 
     def obtain_report_corporation(self, rut: str) -> dict:
         '''Obtain report for corporation'''
 
-        # Add headers
-        headers = {
-            "Authorization": f"Bearer {self.token_juridica}",
-            "Content-Type": "application/json"
-        }
+        # Send request with the corporation token
+        return self._post_report("juridica", self._corporation_payload(rut))
+
+
+    def _corporation_payload(self, rut: str) -> dict:
+        '''Body of the corporation report request'''
 
         # Add payload in a specific format. Only the RUT varies
         payload = {
@@ -143,24 +234,18 @@ class EquifaxClient:
             }
         }
 
-        # Send request and raise for status
-        response = requests.post(self.request_url, headers=headers, json=payload)
-        response.raise_for_status()
-
-        # Obtain response and return
-        result = response.json()
-        return result
+        return payload
 
 
     def obtener_report_person(self, rut: str) -> dict:
         '''Obtain report for person'''
 
+        # Send request with the person token
+        return self._post_report("natural", self._person_payload(rut))
 
-        # Add headers
-        headers = {
-            "Authorization": f"Bearer {self.token_natural}",
-            "Content-Type": "application/json"
-        }
+
+    def _person_payload(self, rut: str) -> dict:
+        '''Body of the person report request'''
 
         # Add payload in a specific format. Only the RUT varies
         payload = {
@@ -183,13 +268,17 @@ class EquifaxClient:
             }
         }
 
-        # Send request and raise for status
-        response = requests.post(self.request_url, headers=headers, json=payload)
-        response.raise_for_status()
+        return payload
+
+
+    def obtain_contacts(self, kind: str, rut: str) -> ContactData:
+        '''Obtain the addresses, phones and emails of a customer of the given
+        kind ("natural" or "juridica"). The report is extracted straight
+        from the raw answer, without keeping the whole document.'''
 
-        # Obtain response and return
-        result = response.json()
-        return result
+        payload = self._person_payload(rut) if kind == NATURAL else self._corporation_payload(rut)
+        content = self._post_report(kind, payload, raw=True)
+        return extract_contacts_from_bytes(kind, content)
 
 
 _equifax_client_instance: Optional[EquifaxClient] = None
@@ -1,6 +1,23 @@
 from typing import Optional
 import os
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from clients.http_transport import HttpTransport, build_transport
+from clients.rate_limiter import build_rate_limiter
+from clients.response_cache import ResponseCache, build_response_cache
+from clients.payload_archive import replay_enabled
+from library.rut import normalize_rut
+from library.gesintel_components import ScreeningResult, AMLResultResponse, AML_RESULT_ADAPTER
+
+# Endpoints served through the generic GET (names used by the cache)
+GESINTEL_ENDPOINTS = [
+    "getAMLResult",
+    "getAMLRisk",
+    "getAMLReport",
+    "getFlagResults",
+    "getEntityData"
+]
 
 class GestintelClient:
     def __init__(
@@ -13,7 +30,9 @@ class GestintelClient:
         endpoint_getaml_report: str,
         endpoint_get_entity_data: str,
         endpoint_get_entity_record: str,
-        debug: bool
+        debug: bool,
+        transport: Optional[HttpTransport] = None,
+        response_cache: Optional[ResponseCache] = None
     ):
         self.gesintel_url = gesintel_url
         self.api_key = api_key
@@ -24,6 +43,20 @@ class GestintelClient:
         self.endpoint_get_entity_data = endpoint_get_entity_data
         self.endpoint_get_entity_record = endpoint_get_entity_record
         self.debug = True if debug == "true" else False
+        self.response_cache = response_cache
+
+        # Shared pool for the concurrent screening (created on first use)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+        # Pooled session, with the authorization header built once
+        self.transport = transport if transport else build_transport(
+            default_headers={
+                'authorization': f'{self.api_key}'
+            },
+            rate_limiter=build_rate_limiter("GESINTEL", 2.5, 5),
+            provider="GESINTEL"
+        )
 
 
     def get_aml_result(self, rut: str) -> tuple[bool, str]:
@@ -36,7 +69,21 @@ class GestintelClient:
         if self.debug:
             print(f"Method getAMLResult, URL: {url}")
 
-        return self._perform_get_request(url, rut)
+        return self._perform_get_request(url, rut, "getAMLResult")
+
+
+    def get_aml_result_report(self, rut: str) -> tuple[bool, Optional[AMLResultResponse]]:
+        '''
+        Same as get_aml_result, but the answer is decoded straight into an
+        AMLResultResponse (bytes to model in one pass, for the audits).
+        '''
+
+        url = self.gesintel_url + self.endpoint_getaml_result
+
+        if self.debug:
+            print(f"Method getAMLResult (modelo), URL: {url}")
+
+        return self._perform_get_request(url, rut, "getAMLResult", adapter=AML_RESULT_ADAPTER)
     
 
     def get_aml_risk(self, rut: str) -> tuple[bool, str]:
@@ -49,7 +96,7 @@ class GestintelClient:
         if self.debug:
             print(f"Method getAMLRisk, URL: {url}")
 
-        return self._perform_get_request(url, rut)
+        return self._perform_get_request(url, rut, "getAMLRisk")
     
 
     def get_aml_report(self, rut: str) -> tuple[bool, str]:
@@ -62,7 +109,7 @@ class GestintelClient:
         if self.debug:
             print(f"Method getAMLReport, URL: {url}")
 
-        return self._perform_get_request(url, rut)
+        return self._perform_get_request(url, rut, "getAMLReport")
     
 
     def get_flag_results(self, rut: str) -> tuple[bool, str]:
@@ -75,7 +122,7 @@ class GestintelClient:
         if self.debug:
             print(f"Method getFlagResults, URL: {url}")
 
-        return self._perform_get_request(url, rut)
+        return self._perform_get_request(url, rut, "getFlagResults")
 
 
     def get_entity_data(self, rut: str) -> tuple[bool, str]:
@@ -88,7 +135,7 @@ class GestintelClient:
         if self.debug:
             print(f"Method getEntityData, URL: {url}")
 
-        return self._perform_get_request(url, rut)
+        return self._perform_get_request(url, rut, "getEntityData")
     
 
     def get_entity_record(self, rut: str) -> tuple[bool, str]:
@@ -101,13 +148,8 @@ class GestintelClient:
         if self.debug:
             print(f"Method getEntityReport, URL: {url}")
 
-        # Add headers
-        headers = {
-            'authorization': f'{self.api_key}'
-        }
-
         # Call service
-        response = requests.get(url=url, headers=headers)
+        response = self.transport.get(url=url, endpoint="getEntityRecord", archive_key=normalize_rut(rut))
 
         # Control for not found and return False and nothing
         if response.status_code == 404:
@@ -118,14 +160,90 @@ class GestintelClient:
         response.raise_for_status()
 
         # Return found and the report
-        return True, response.json()
+        return True, self.transport.json(response, "getEntityRecord")
 
 
 
 
-    def _perform_get_request(self, url: str, rut: str) -> tuple[bool, str]:
+    def screen(self, rut: str, endpoints: list = None) -> ScreeningResult:
+        '''
+        Query several endpoints for a RUT at the same time and merge the answers.
+        The latency is roughly the one of the slowest endpoint.
+        By default, all the endpoints are queried.
+        '''
+
+        return self.screen_many([rut], endpoints)[0]
+
+
+    def screen_many(self, ruts: list, endpoints: list = None) -> list[ScreeningResult]:
+        '''
+        Batch version of screen. All the (RUT, endpoint) calls share the same
+        pool, so up to the pool size calls are in flight at any time.
+        Returns one ScreeningResult per RUT, in the same order.
+        '''
+
+        # Map the endpoint names to the methods that call them
+        methods = {
+            "getAMLResult": self.get_aml_result,
+            "getAMLRisk": self.get_aml_risk,
+            "getAMLReport": self.get_aml_report,
+            "getFlagResults": self.get_flag_results,
+            "getEntityData": self.get_entity_data,
+            "getEntityRecord": self.get_entity_record
+        }
+
+        endpoints = endpoints if endpoints else list(methods)
+
+        unknown = [endpoint for endpoint in endpoints if endpoint not in methods]
+        if unknown:
+            raise ValueError(f"Endpoints not recognized: {', '.join(unknown)}")
+
+        results = [ScreeningResult(rut=str(rut)) for rut in ruts]
+
+        executor = self._get_executor()
+        futures = {
+            executor.submit(methods[endpoint], str(rut)): (position, endpoint)
+            for position, rut in enumerate(ruts)
+            for endpoint in endpoints
+        }
+
+        for future in as_completed(futures):
+            position, endpoint = futures[future]
+            result = results[position]
+
+            # A failing endpoint doesn't discard the others
+            try:
+                found, report = future.result()
+            except Exception as e:
+                result.errors[endpoint] = str(e)
+                continue
+
+            result.found[endpoint] = found
+            if found:
+                result.reports[endpoint] = report
+
+        return results
+
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        '''Create the screening pool, sized like the connection pool'''
+
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.transport.pool_size,
+                    thread_name_prefix="gesintel"
+                )
+            return self._executor
+
+
+    def _perform_get_request(self, url: str, rut: str, endpoint: str = None, adapter=None) -> tuple[bool, str]:
         '''
         Implements a generic GET on the API endpoints. Should work for all of them.
+        If the response cache is enabled, answers (including 404) are served
+        from it while they are valid, and stored after each call.
+        The report is decoded once from the raw bytes (from the network or
+        the cache): into dicts, or into a model when a TypeAdapter is given.
 
         Raises:
         requests.HTTPError: If the request fails with a non-404 HTTP error.
@@ -135,10 +253,17 @@ class GestintelClient:
                         Returns (False, None) if record not found (404).
         '''
 
-        # Add headers
-        headers = {
-            'authorization': f'{self.api_key}'
-        }
+        # In replay mode the answers come from the payload archive only
+        use_cache = self.response_cache is not None and endpoint and not replay_enabled()
+
+        # Serve from the cache if possible
+        if use_cache:
+            cached = self.response_cache.get(endpoint, rut, raw=True)
+            if cached is not None:
+                if self.debug:
+                    print(f"Respuesta de {endpoint} para RUT {rut} obtenida del caché")
+                found, body = cached
+                return found, self._decode(body, endpoint, adapter) if found else None
 
         # Add params
         params = {
@@ -146,18 +271,38 @@ class GestintelClient:
         }
 
         # Call service
-        response = requests.get(url=url, params=params, headers=headers)
+        response = self.transport.get(
+            url=url,
+            params=params,
+            endpoint=endpoint,
+            archive_key=normalize_rut(rut)
+        )
 
         # Control for not found and return False and nothing
         if response.status_code == 404:
             print(f"Informe para RUT {rut} no encontrado...")
-            return False, None
+            found, body = False, None
         
-        # Raise for status
-        response.raise_for_status()
+        else:
+            # Raise for status
+            response.raise_for_status()
 
-        # Return found and the report
-        return True, response.json()
+            # Found and the report
+            found, body = True, response.content
+
+        # Keep the answer for the next runs, as received
+        if use_cache:
+            self.response_cache.put(endpoint, rut, found, None, raw=body)
+
+        return found, self._decode(body, endpoint, adapter) if found else None
+
+
+    def _decode(self, body: bytes, endpoint: str, adapter=None):
+        '''Decode a report into dicts, or into a model with the adapter'''
+
+        if adapter is not None:
+            return self.transport.decoder.validate(adapter, body, endpoint)
+        return self.transport.decoder.decode(body, endpoint)
 
 
  
@@ -208,6 +353,9 @@ def get_gestintel_client() -> GestintelClient:
                     "Please check your .env file or environment configuration."
                 )
         
+        # On-disk cache of the answers, to avoid paying twice for a RUT
+        response_cache = build_response_cache("GESINTEL", GESINTEL_ENDPOINTS)
+
         _gesintel_client = GestintelClient(
             gesintel_url=base_url,
             api_key=api_key,
@@ -217,7 +365,8 @@ def get_gestintel_client() -> GestintelClient:
             endpoint_get_flag_results=endpoint_get_flag_results,
             endpoint_get_entity_data=endpoint_get_entity_data,
             endpoint_get_entity_record=endpoint_get_entity_record,
-            debug=debug 
+            debug=debug,
+            response_cache=response_cache
         )
     
     return _gesintel_client
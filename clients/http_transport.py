@@ -0,0 +1,413 @@
+import os
+import json
+import time
+import threading
+from typing import Optional
+import requests
+from requests.adapters import HTTPAdapter
+from clients.rate_limiter import TokenBucket
+from clients.retry_policy import RetryPolicy, build_retry_policy
+from clients.single_flight import SingleFlight
+from clients.circuit_breaker import CircuitBreakerRegistry, build_circuit_breakers
+from clients.payload_archive import PayloadArchive, ReplayMissError, get_payload_archive, replay_enabled
+from clients.response_decoder import ResponseDecoder
+
+
+class HttpTransport:
+    '''Shared HTTP layer for the provider clients.
+
+    Wraps a single requests.Session with per-host connection pools and
+    keep-alive, so consecutive calls to the same provider reuse the TCP/TLS
+    connection instead of opening a new one for every RUT. When a rate
+    limiter is given, every call waits for its token before being sent.
+    When a retry policy is given, transient failures of idempotent calls are
+    retried according to it. When single-flight is enabled, identical calls
+    in flight at the same time are sent only once and share the response.
+    When circuit breakers are given, an endpoint that keeps failing is
+    refused fast (CircuitOpenError) until a probe call succeeds.
+    When a payload archive is given, the answers of the calls made with an
+    archive_key are archived; in replay mode they are read back from it and
+    nothing is sent. The clients decode the answers through json() and
+    validate() (from the raw bytes, with per-endpoint decode times).'''
+
+    def __init__(
+            self,
+            pool_size: int = 10,
+            pool_connections: int = 4,
+            default_headers: Optional[dict] = None,
+            timeout: Optional[float] = 60,
+            rate_limiter: Optional[TokenBucket] = None,
+            retry_policy: Optional[RetryPolicy] = None,
+            single_flight: Optional[SingleFlight] = None,
+            circuit_breakers: Optional[CircuitBreakerRegistry] = None,
+            provider: Optional[str] = None,
+            archive: Optional[PayloadArchive] = None
+    ):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
+        self.single_flight = single_flight
+        self.circuit_breakers = circuit_breakers
+        self.provider = provider
+        self.archive = archive
+
+        # Session with the headers that never change for the provider
+        self.session = requests.Session()
+        self.session.headers.update(default_headers or {})
+
+        # One pool per host, with up to pool_size keep-alive connections.
+        # pool_block makes extra threads wait for a free connection instead
+        # of opening (and later discarding) one-off connections.
+        self.adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_size,
+            pool_block=True
+        )
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+
+        # Counters for the stats
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._in_flight = 0
+
+        # Decoding of the answers, with its own timings
+        self.decoder = ResponseDecoder()
+
+
+    def request(
+            self,
+            method: str,
+            url: str,
+            idempotent: Optional[bool] = None,
+            endpoint: Optional[str] = None,
+            archive_key: Optional[str] = None,
+            **kwargs
+    ) -> requests.Response:
+        '''Perform a request through the pooled session.
+
+        idempotent overrides the retry policy's own decision, for POSTs that
+        only query data. endpoint names the circuit the call belongs to (the
+        URL usually carries the RUT, so it can't be used for that).
+        archive_key is the RUT or id the call is about, for the payload archive.
+        On giving up after a retryable status, the last response is returned
+        so the client keeps its own error handling.'''
+
+        if replay_enabled():
+            return self._replay(endpoint, archive_key)
+
+        kwargs.setdefault("timeout", self.timeout)
+
+        if self.single_flight is None:
+            return self._fetch(method, url, idempotent, endpoint, archive_key, **kwargs)
+
+        # Join an identical call if there is one in flight
+        key = self._flight_key(method, url, kwargs)
+        return self.single_flight.do(key, self._fetch, method, url, idempotent, endpoint, archive_key, **kwargs)
+
+
+    def _fetch(
+            self,
+            method: str,
+            url: str,
+            idempotent: Optional[bool],
+            endpoint: Optional[str],
+            archive_key: Optional[str],
+            **kwargs
+    ) -> requests.Response:
+        '''Send the request and archive its answer. Under single-flight only
+        the leader gets here, so a shared answer is archived once.'''
+
+        response = self._guarded_request(method, url, idempotent, endpoint, **kwargs)
+
+        # Keep the raw answer: data and "not found", not failures
+        if (
+            self.archive is not None and archive_key is not None and
+            (response.ok or response.status_code == 404)
+        ):
+            self.archive.put(self.provider, endpoint, archive_key, response.status_code, response.content)
+
+        return response
+
+
+    def json(self, response: requests.Response, endpoint: Optional[str] = None):
+        '''Decode the JSON body of a response from its raw bytes'''
+        return self.decoder.decode(response.content, endpoint)
+
+
+    def validate(self, response: requests.Response, adapter, endpoint: Optional[str] = None):
+        '''Decode the JSON body of a response straight into a model'''
+        return self.decoder.validate(adapter, response.content, endpoint)
+
+
+    def _replay(self, endpoint: Optional[str], archive_key: Optional[str]) -> requests.Response:
+        '''Build the response of a call from the payload archive'''
+
+        archive = self.archive if self.archive is not None else get_payload_archive()
+
+        record = None
+        if archive is not None and archive_key is not None:
+            record = archive.latest(self.provider, endpoint, archive_key)
+
+        if record is None:
+            raise ReplayMissError(f"Sin respuesta archivada para {self.provider}/{endpoint}/{archive_key}")
+
+        status, body = record
+
+        response = requests.Response()
+        response.status_code = status
+        response._content = body
+        response.headers["Content-Type"] = "application/json"
+        response.url = f"replay://{self.provider}/{endpoint}/{archive_key}"
+        return response
+
+
+    def _guarded_request(
+            self,
+            method: str,
+            url: str,
+            idempotent: Optional[bool] = None,
+            endpoint: Optional[str] = None,
+            **kwargs
+    ) -> requests.Response:
+        '''Send the request through the circuit breaker of its endpoint'''
+
+        if self.circuit_breakers is None:
+            return self._request_with_retries(method, url, idempotent, **kwargs)
+
+        breaker = self.circuit_breakers.get(endpoint or "default")
+
+        # Fail fast while the endpoint is known to be down
+        breaker.before_call()
+
+        started = time.monotonic()
+        try:
+            response = self._request_with_retries(method, url, idempotent, **kwargs)
+        except Exception:
+            breaker.record(False, time.monotonic() - started)
+            raise
+
+        success = response.status_code < 500 and response.status_code != 429
+        breaker.record(success, time.monotonic() - started)
+
+        return response
+
+
+    def _flight_key(self, method: str, url: str, kwargs: dict) -> str:
+        '''Identify a call by method, endpoint and everything that makes it
+        unique (query parameters, body, per-call headers and credentials)'''
+
+        auth = kwargs.get("auth")
+
+        return json.dumps(
+            [
+                method.upper(),
+                url,
+                kwargs.get("params"),
+                kwargs.get("json"),
+                kwargs.get("data"),
+                kwargs.get("headers"),
+                getattr(auth, "username", None)
+            ],
+            sort_keys=True,
+            default=str
+        )
+
+
+    def _request_with_retries(
+            self,
+            method: str,
+            url: str,
+            idempotent: Optional[bool] = None,
+            **kwargs
+    ) -> requests.Response:
+        '''Send the request, retrying it according to the policy'''
+
+        policy = self.retry_policy
+        if policy is not None and idempotent is None:
+            idempotent = policy.is_idempotent(method, kwargs.get("headers"))
+        can_retry = policy is not None and idempotent
+
+        attempt = 0
+        started = time.monotonic()
+
+        while True:
+            try:
+                response = self._send(method, url, **kwargs)
+
+            except (requests.ConnectionError, requests.Timeout):
+                if not can_retry:
+                    raise
+
+                delay = policy.next_delay(attempt, started)
+                if delay is None:
+                    policy.record_give_up()
+                    raise
+
+            else:
+                if not can_retry or not policy.should_retry_status(response.status_code):
+                    return response
+
+                delay = policy.next_delay(attempt, started, response)
+                if delay is None:
+                    policy.record_give_up()
+                    return response
+
+                # Release the connection before waiting
+                response.close()
+
+            policy.record_retry()
+            time.sleep(delay)
+            attempt += 1
+
+
+    def _send(self, method: str, url: str, **kwargs) -> requests.Response:
+        '''Send a single attempt, respecting the rate limit'''
+
+        # Respect the contracted rate of the provider
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+
+        with self._lock:
+            self._requests += 1
+            self._in_flight += 1
+
+        try:
+            return self.session.request(method, url, **kwargs)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        '''GET through the pooled session'''
+        return self.request("GET", url, **kwargs)
+
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        '''POST through the pooled session'''
+        return self.request("POST", url, **kwargs)
+
+
+    def stats(self) -> dict:
+        '''Return connection pool statistics:
+
+        requests: calls made through the transport
+        new_connections: TCP/TLS connections opened by the live pools
+        reuse_ratio: share of pooled requests that reused a connection
+        open_connections: idle keep-alive connections plus requests in flight
+        retries / gave_up: counters of the retry policy, if any
+        saved_calls: duplicate calls answered by single-flight, if enabled
+        circuits: state of each endpoint circuit, if enabled
+        decoding: decode counters and times per endpoint'''
+
+        pools = self.adapter.poolmanager.pools
+        pool_requests = 0
+        new_connections = 0
+        idle_connections = 0
+
+        for key in pools.keys():
+            try:
+                pool = pools[key]
+            except KeyError:
+                # Pool evicted between listing and reading it
+                continue
+
+            pool_requests += pool.num_requests
+            new_connections += pool.num_connections
+
+            if pool.pool is not None:
+                idle_connections += sum(
+                    1 for conn in list(pool.pool.queue) if conn is not None
+                )
+
+        if pool_requests:
+            reuse_ratio = round((pool_requests - new_connections) / pool_requests, 4)
+        else:
+            reuse_ratio = 0.0
+
+        with self._lock:
+            total_requests = self._requests
+            in_flight = self._in_flight
+
+        stats = {
+            "requests": total_requests,
+            "new_connections": new_connections,
+            "reuse_ratio": reuse_ratio,
+            "open_connections": idle_connections + in_flight
+        }
+
+        if self.retry_policy is not None:
+            stats.update(self.retry_policy.stats())
+
+        if self.single_flight is not None:
+            stats.update(self.single_flight.stats())
+
+        if self.circuit_breakers is not None:
+            stats["circuits"] = self.circuit_breakers.stats()
+
+        stats["decoding"] = self.decoder.stats()
+
+        return stats
+
+
+    def print_stats(self, name: str = "") -> None:
+        '''Print the pool statistics in a single line'''
+
+        stats = self.stats()
+        print(
+            f"Conexiones {name}: {stats['requests']} requests, "
+            f"{stats['new_connections']} conexiones nuevas, "
+            f"reutilización {stats['reuse_ratio'] * 100:.1f}%, "
+            f"{stats['open_connections']} abiertas"
+        )
+
+        if "retries" in stats:
+            print(f"Reintentos {name}: {stats['retries']}, abandonados: {stats['gave_up']}")
+
+        if "saved_calls" in stats:
+            print(f"Llamadas duplicadas ahorradas {name}: {stats['saved_calls']} de {stats['coalesced_calls']}")
+
+        for endpoint, circuit in stats.get("circuits", {}).items():
+            if circuit["times_opened"]:
+                print(f"Circuito {name}/{endpoint}: {circuit['state']}, abierto {circuit['times_opened']} veces")
+
+        self.decoder.print_stats(name)
+
+
+    def close(self) -> None:
+        '''Close every pooled connection'''
+        self.session.close()
+
+
+def build_transport(
+        default_headers: Optional[dict] = None,
+        rate_limiter: Optional[TokenBucket] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        provider: Optional[str] = None
+) -> HttpTransport:
+    '''Create a transport configured from the environment.
+
+    HTTP_POOL_SIZE: keep-alive connections per host (default 10)
+    HTTP_TIMEOUT: seconds before a request is abandoned (default 60)
+    HTTP_SINGLE_FLIGHT: "false" disables the coalescing of duplicate calls
+    If no retry policy is given, one is built from the RETRY_* variables.
+    With a provider name, its endpoints get circuit breakers (CIRCUIT_*)
+    and its answers go to the payload archive (PAYLOAD_ARCHIVE*).'''
+
+    pool_size = int(os.getenv("HTTP_POOL_SIZE", "10"))
+    timeout = float(os.getenv("HTTP_TIMEOUT", "60"))
+    coalesce = os.getenv("HTTP_SINGLE_FLIGHT", "true").lower() != "false"
+
+    return HttpTransport(
+        pool_size=pool_size,
+        default_headers=default_headers,
+        timeout=timeout,
+        rate_limiter=rate_limiter,
+        retry_policy=retry_policy if retry_policy else build_retry_policy(),
+        single_flight=SingleFlight() if coalesce else None,
+        circuit_breakers=build_circuit_breakers(provider) if provider else None,
+        provider=provider,
+        archive=get_payload_archive() if provider else None
+    )
@@ -0,0 +1,321 @@
+import os
+import time
+import zlib
+import hashlib
+import sqlite3
+import threading
+from typing import Optional
+
+# zstandard is optional: without it the payloads are compressed with zlib
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class ReplayMissError(LookupError):
+    '''Raised in replay mode when the archive has no answer for a call'''
+
+
+class PayloadArchive:
+    '''Local archive of the raw responses of the providers.
+
+    Every answer is kept as it came from the network (status and body),
+    keyed by provider, endpoint, key (the RUT or id the call is about) and
+    fetch time. Older answers are not replaced, so the archive doubles as
+    an audit trail. In replay mode the transports read the latest answer
+    from here instead of calling the provider, so rules can be re-run over
+    the archived data at disk speed and with zero API cost.
+
+    Bodies are content-addressed: identical payloads (same SHA-256) are
+    stored once, whatever the RUT or time they came with. They are
+    compressed with zstd when available, using a dictionary trained per
+    provider and endpoint once dict_samples payloads have been seen (the
+    reports of a provider repeat the same keys and structure), or with
+    zlib otherwise. Each blob records how it was compressed, so blobs of
+    different codecs or dictionaries live together.'''
+
+    def __init__(
+            self,
+            path: str,
+            compression_level: int = 9,
+            dict_samples: int = 200,
+            dict_size: int = 112 * 1024
+    ):
+        self.path = path
+        self.compression_level = compression_level
+        self.dict_samples = dict_samples
+        self.dict_size = dict_size
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                provider TEXT NOT NULL,
+                endpoint TEXT NOT NULL,
+                key TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                status INTEGER NOT NULL,
+                hash TEXT NOT NULL
+            )
+            """
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS idx_entries_key "
+            "ON entries (provider, endpoint, key, fetched_at)"
+        )
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS blobs (
+                hash TEXT PRIMARY KEY,
+                codec TEXT NOT NULL,
+                dict_id INTEGER,
+                size INTEGER NOT NULL,
+                body BLOB
+            )
+            """
+        )
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS dictionaries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                provider TEXT NOT NULL,
+                endpoint TEXT NOT NULL,
+                data BLOB NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self._connection.commit()
+
+        # Dictionaries in use: (provider, endpoint) -> id, and id -> data
+        self._dict_ids = {}
+        self._dict_data = {}
+        for dict_id, provider, endpoint, data in self._connection.execute(
+            "SELECT id, provider, endpoint, data FROM dictionaries ORDER BY id"
+        ):
+            self._dict_ids[(provider, endpoint)] = dict_id
+            self._dict_data[dict_id] = data
+
+        # Payloads seen per (provider, endpoint) until its dictionary is trained
+        self._samples = {}
+
+        # Compressors and decompressors, per dictionary (None: no dictionary)
+        self._compressors = {}
+        self._decompressors = {}
+
+        # Counters
+        self.stored = 0
+        self.deduplicated = 0
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+        self.replayed = 0
+        self.missed = 0
+
+
+    def _compressor(self, dict_id: Optional[int]):
+        if dict_id not in self._compressors:
+            if dict_id is None:
+                self._compressors[dict_id] = zstandard.ZstdCompressor(level=self.compression_level)
+            else:
+                self._compressors[dict_id] = zstandard.ZstdCompressor(
+                    level=self.compression_level,
+                    dict_data=zstandard.ZstdCompressionDict(self._dict_data[dict_id])
+                )
+        return self._compressors[dict_id]
+
+
+    def _decompressor(self, dict_id: Optional[int]):
+        if dict_id not in self._decompressors:
+            if dict_id is None:
+                self._decompressors[dict_id] = zstandard.ZstdDecompressor()
+            else:
+                self._decompressors[dict_id] = zstandard.ZstdDecompressor(
+                    dict_data=zstandard.ZstdCompressionDict(self._dict_data[dict_id])
+                )
+        return self._decompressors[dict_id]
+
+
+    def _train_dictionary(self, provider: str, endpoint: str) -> None:
+        '''Train the dictionary of an endpoint from the payloads seen so far.
+        Must hold the lock.'''
+
+        samples = self._samples.pop((provider, endpoint), [])
+
+        try:
+            trained = zstandard.train_dictionary(self.dict_size, samples)
+        except zstandard.ZstdError as e:
+            # Too few or too similar samples: keep compressing without one
+            print(f"No se pudo entrenar el diccionario de {provider}/{endpoint}: {e}")
+            return
+
+        cursor = self._connection.execute(
+            "INSERT INTO dictionaries (provider, endpoint, data, created_at) VALUES (?, ?, ?, ?)",
+            (provider, endpoint, trained.as_bytes(), time.time())
+        )
+        self._dict_ids[(provider, endpoint)] = cursor.lastrowid
+        self._dict_data[cursor.lastrowid] = trained.as_bytes()
+
+
+    def _compress(self, provider: str, endpoint: str, body: bytes) -> tuple[str, Optional[int], bytes]:
+        '''Compress a body with the best codec available. Must hold the lock.'''
+
+        if zstandard is None:
+            return "zlib", None, zlib.compress(body, self.compression_level)
+
+        dict_id = self._dict_ids.get((provider, endpoint))
+
+        if dict_id is None and self.dict_samples > 0:
+            samples = self._samples.setdefault((provider, endpoint), [])
+            samples.append(body)
+            if len(samples) >= self.dict_samples:
+                self._train_dictionary(provider, endpoint)
+                dict_id = self._dict_ids.get((provider, endpoint))
+
+        codec = "zstd-dict" if dict_id is not None else "zstd"
+        return codec, dict_id, self._compressor(dict_id).compress(body)
+
+
+    def _decompress(self, codec: str, dict_id: Optional[int], data: bytes) -> bytes:
+        if codec == "zlib":
+            return zlib.decompress(data)
+
+        if zstandard is None:
+            raise RuntimeError("El archivo tiene respuestas zstd y zstandard no está instalado")
+
+        return self._decompressor(dict_id).decompress(data)
+
+
+    def _store(self, provider: str, endpoint: str, key: str, status: int, body: bytes, fetched_at: float) -> None:
+        '''Store an entry and its blob (only if new). Must hold the lock.'''
+
+        digest = hashlib.sha256(body).hexdigest()
+
+        known = self._connection.execute(
+            "SELECT 1 FROM blobs WHERE hash = ?", (digest,)
+        ).fetchone()
+
+        if known:
+            self.deduplicated += 1
+        else:
+            codec, dict_id, data = self._compress(provider, endpoint, body)
+            self._connection.execute(
+                "INSERT INTO blobs (hash, codec, dict_id, size, body) VALUES (?, ?, ?, ?, ?)",
+                (digest, codec, dict_id, len(body), data)
+            )
+            self.raw_bytes += len(body)
+            self.compressed_bytes += len(data)
+
+        self._connection.execute(
+            "INSERT INTO entries (provider, endpoint, key, fetched_at, status, hash) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (provider, endpoint, key, fetched_at, status, digest)
+        )
+
+
+    def put(self, provider: str, endpoint: str, key: str, status: int, body: bytes) -> None:
+        '''Archive a raw answer'''
+
+        with self._lock:
+            self._store(provider, endpoint, key, status, body or b"", time.time())
+            self._connection.commit()
+            self.stored += 1
+
+
+    def latest(self, provider: str, endpoint: str, key: str) -> Optional[tuple[int, bytes]]:
+        '''Return the (status, body) of the latest answer, or None'''
+
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT entries.status, blobs.codec, blobs.dict_id, blobs.body "
+                "FROM entries JOIN blobs ON blobs.hash = entries.hash "
+                "WHERE entries.provider = ? AND entries.endpoint = ? AND entries.key = ? "
+                "ORDER BY entries.fetched_at DESC LIMIT 1",
+                (provider, endpoint, key)
+            ).fetchone()
+
+            if row is None:
+                self.missed += 1
+                return None
+
+            self.replayed += 1
+            status, codec, dict_id, data = row
+            return status, self._decompress(codec, dict_id, data)
+
+
+    def stats(self) -> dict:
+        '''Return the archive counters. ratio is stored bytes over raw bytes
+        for the payloads archived by this process (deduplicated ones excluded)'''
+
+        with self._lock:
+            ratio = round(self.compressed_bytes / self.raw_bytes, 4) if self.raw_bytes else 0.0
+            return {
+                "stored": self.stored,
+                "deduplicated": self.deduplicated,
+                "raw_bytes": self.raw_bytes,
+                "compressed_bytes": self.compressed_bytes,
+                "ratio": ratio,
+                "replayed": self.replayed,
+                "missed": self.missed
+            }
+
+
+    def print_stats(self) -> None:
+        stats = self.stats()
+        print(
+            f"Archivo de respuestas: {stats['stored']} guardadas "
+            f"({stats['deduplicated']} repetidas), "
+            f"compresión {stats['ratio'] * 100:.1f}%, "
+            f"{stats['replayed']} reproducidas, {stats['missed']} no encontradas"
+        )
+
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+# Replay mode, shared by every transport
+_replay_mode = os.getenv("REPLAY_MODE", "false").lower() == "true"
+
+def set_replay_mode(enabled: bool) -> None:
+    '''Read the answers from the archive (True) or from the network (False)'''
+
+    global _replay_mode
+    _replay_mode = enabled
+
+
+def replay_enabled() -> bool:
+    return _replay_mode
+
+
+# Instance of the archive
+_payload_archive: Optional[PayloadArchive] = None
+_payload_archive_lock = threading.Lock()
+
+def get_payload_archive() -> Optional[PayloadArchive]:
+    '''PayloadArchive singleton, configured from the environment.
+
+    PAYLOAD_ARCHIVE: "false" disables the archive (enabled by default;
+    replay mode needs it)
+    PAYLOAD_ARCHIVE_FILE: SQLite file (default payload_archive.sqlite)
+    PAYLOAD_ARCHIVE_LEVEL: compression level (default 9)
+    PAYLOAD_ARCHIVE_DICT_SAMPLES: payloads per endpoint used to train its
+    zstd dictionary (default 200, 0 disables the dictionaries)'''
+
+    global _payload_archive
+
+    if os.getenv("PAYLOAD_ARCHIVE", "true").lower() == "false" and not _replay_mode:
+        return None
+
+    with _payload_archive_lock:
+        if _payload_archive is None:
+            _payload_archive = PayloadArchive(
+                os.getenv("PAYLOAD_ARCHIVE_FILE", "payload_archive.sqlite"),
+                compression_level=int(os.getenv("PAYLOAD_ARCHIVE_LEVEL", "9")),
+                dict_samples=int(os.getenv("PAYLOAD_ARCHIVE_DICT_SAMPLES", "200"))
+            )
+
+    return _payload_archive
@@ -2,6 +2,9 @@ import os
 from typing import Optional
 import requests
 import json
+from clients.http_transport import HttpTransport, build_transport
+from clients.rate_limiter import build_rate_limiter
+from library.rut import normalize_rut
 
 class PluttoClient:
     def __init__(
@@ -12,7 +15,8 @@ class PluttoClient:
         endpoint_validation: str,
         endpoint_validation_for_wl: str,
         endpoint_watchlists: str,
-        debug: bool
+        debug: bool,
+        transport: Optional[HttpTransport] = None
     ):
         self.base_url = base_url
         self.token = token
@@ -22,6 +26,16 @@ class PluttoClient:
         self.endpoint_watchlists = endpoint_watchlists
         self.debug = True if debug == "true" else False
 
+        # Pooled session, with the headers shared by every call built once
+        self.transport = transport if transport else build_transport(
+            default_headers={
+                'accept': 'application/json',
+                'authorization': f'Bearer {self.token}'
+            },
+            rate_limiter=build_rate_limiter("PLUTTO", 10, 10),
+            provider="PLUTTO"
+        )
+
 
     def obtain_validation_by_tin(self, rut: str) -> tuple[bool, str]:
 
@@ -34,13 +48,7 @@ class PluttoClient:
             print("Ejecutando validación por RUT...")
             print(url)
 
-        # Add headers
-        headers = {
-            'accept': 'application/json',
-            'authorization': f'Bearer {self.token}'
-        }
-
-        response = requests.get(url, headers=headers)
+        response = self.transport.get(url, endpoint="validation_by_tin", archive_key=normalize_rut(rut))
 
         if response.status_code == 404:
             if self.debug: print("Informe no encotrado, retornará False")
@@ -50,7 +58,7 @@ class PluttoClient:
         elif response.status_code == 200:
             if self.debug: print("Informe encontrado, retornará JSON")
             found = True
-            report = response.json()
+            report = self.transport.json(response, "validation_by_tin")
             return found, report
         
         else:
@@ -66,13 +74,6 @@ class PluttoClient:
         # Build the required URL
         url = self.base_url + self.endpoint_validation
 
-        # Add headers
-        headers = {
-            'accept': 'application/json',
-            'Content-Type': 'application/json',
-            'authorization': f'Bearer {self.token}'
-        }
-        
         payload = {
             "entity_validation":{
             "country": "CL",
@@ -84,9 +85,14 @@ class PluttoClient:
             print(url)
             print(payload)
 
-        response = requests.post(url=url, headers=headers, json=payload)
+        response = self.transport.post(
+            url=url,
+            json=payload,
+            endpoint="validation",
+            archive_key=normalize_rut(rut)
+        )
 
-        report = response.json()
+        report = self.transport.json(response, "validation")
         id = report.get('id', None)
 
         if response.status_code == 201:
@@ -117,13 +123,7 @@ class PluttoClient:
             print("Ejecutando validación por ID...")
             print(url)
 
-        # Add headers
-        headers = {
-            'accept': 'application/json',
-            'authorization': f'Bearer {self.token}'
-        }
-
-        response = requests.get(url, headers=headers)
+        response = self.transport.get(url, endpoint="validation_by_id", archive_key=id)
 
         if response.status_code == 404:
             if self.debug: print("Informe no encontrado, retornará False")
@@ -133,7 +133,7 @@ class PluttoClient:
         elif response.status_code == 200:
             if self.debug: print("Informe encontrado, retornará JSON")
             found = True
-            report = response.json()
+            report = self.transport.json(response, "validation_by_id")
             return found, report
         
         else:
@@ -155,18 +155,12 @@ class PluttoClient:
             print("Ejecutando validación por ID...")
             print(url)
 
-        # Add headers
-        headers = {
-            'accept': 'application/json',
-            'authorization': f'Bearer {self.token}'
-        }
-
-        response = requests.get(url, headers=headers)
+        response = self.transport.get(url, endpoint="watchlists", archive_key=id)
 
         # If the report was found, return true and the report
         if response.status_code == 200:
             found = True
-            report = response.json()
+            report = self.transport.json(response, "watchlists")
             return found, report
         
         elif response.status_code == 500:
@@ -0,0 +1,73 @@
+import os
+import time
+import asyncio
+import threading
+
+
+class TokenBucket:
+    '''Token-bucket rate limiter for a provider.
+
+    Tokens refill continuously at `rate` per second, up to `burst` tokens.
+    Each call takes one token; when none is left the caller waits exactly
+    until the next one is due. The bookkeeping is done under a thread lock
+    and the wait happens outside of it, so the same bucket can be shared by
+    worker threads (acquire) and asyncio tasks (acquire_async).
+    A rate of 0 (or less) disables the limit.'''
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+
+    def _reserve(self) -> float:
+        '''Take a token and return how many seconds to wait before using it'''
+
+        if self.rate <= 0:
+            return 0.0
+
+        with self._lock:
+            now = time.monotonic()
+
+            # Refill according to the time elapsed since the last call
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+            # Take the token. A negative balance means it is already promised
+            # to the callers ahead, so this one waits for its turn.
+            self.tokens -= 1
+
+            if self.tokens >= 0:
+                return 0.0
+
+            return -self.tokens / self.rate
+
+
+    def acquire(self) -> None:
+        '''Block the current thread until a token is available'''
+
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+
+    async def acquire_async(self) -> None:
+        '''Suspend the current task until a token is available'''
+
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+def build_rate_limiter(provider: str, default_rate: float, default_burst: int) -> TokenBucket:
+    '''Create the limiter of a provider from the environment.
+
+    <PROVIDER>_RATE_LIMIT: requests per second (0 disables the limit)
+    <PROVIDER>_BURST: requests allowed back to back'''
+
+    rate = float(os.getenv(f"{provider}_RATE_LIMIT", str(default_rate)))
+    burst = int(os.getenv(f"{provider}_BURST", str(default_burst)))
+
+    return TokenBucket(rate=rate, burst=burst)
@@ -0,0 +1,243 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Optional
+from library.rut import normalize_rut
+from clients.response_decoder import loads
+
+
+class ResponseCache:
+    '''Persistent SQLite cache for provider responses.
+
+    Entries are keyed by endpoint + normalized RUT and keep the raw JSON
+    bytes, unchanged, with their fetch timestamp. Each endpoint has its own
+    TTL; "not found" (404) answers are cached separately with a shorter TTL.
+    When the cache grows beyond max_entries the least recently used entries
+    are evicted.'''
+
+    def __init__(
+            self,
+            path: str,
+            ttls: Optional[dict] = None,
+            default_ttl: float = 86400,
+            negative_ttl: float = 3600,
+            max_entries: int = 200000
+    ):
+        self.path = path
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                endpoint TEXT NOT NULL,
+                rut TEXT NOT NULL,
+                found INTEGER NOT NULL,
+                body BLOB,
+                fetched_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (endpoint, rut)
+            )
+            """
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS idx_responses_access ON responses (last_access)"
+        )
+        self._connection.commit()
+
+        self._size = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+        # Counters
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.expired = 0
+
+
+    @staticmethod
+    def normalize_rut(rut: str) -> str:
+        '''Same RUT, same key: "76.431.161-2", "76431161-2" and "764311612"'''
+        return normalize_rut(rut)
+
+
+    def _ttl(self, endpoint: str, found: bool) -> float:
+        if not found:
+            return self.negative_ttl
+        return self.ttls.get(endpoint, self.default_ttl)
+
+
+    def get(self, endpoint: str, rut: str, raw: bool = False) -> Optional[tuple[bool, Optional[dict]]]:
+        '''Return the cached (found, report) tuple, or None on a miss or an
+        expired entry. With raw, the report is returned as the JSON bytes,
+        for the caller to decode.'''
+
+        key = self.normalize_rut(rut)
+        now = time.time()
+
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT found, body, fetched_at FROM responses WHERE endpoint = ? AND rut = ?",
+                (endpoint, key)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            found, body, fetched_at = bool(row[0]), row[1], row[2]
+
+            if now - fetched_at > self._ttl(endpoint, found):
+                self.expired += 1
+                return None
+
+            # Keep track of the use for the LRU eviction
+            self._connection.execute(
+                "UPDATE responses SET last_access = ? WHERE endpoint = ? AND rut = ?",
+                (now, endpoint, key)
+            )
+            self._connection.commit()
+
+            if found:
+                self.hits += 1
+                if raw and isinstance(body, str):
+                    # Entry written as text by an older version of the cache
+                    body = body.encode("utf-8")
+                return True, body if raw else loads(body)
+
+            self.negative_hits += 1
+            return False, None
+
+
+    def put(self, endpoint: str, rut: str, found: bool, report: Optional[dict], raw: Optional[bytes] = None) -> None:
+        '''Store a response (found or not found). raw, the JSON bytes of the
+        report as received, is stored as is instead of re-encoding report.'''
+
+        key = self.normalize_rut(rut)
+        now = time.time()
+        if not found:
+            body = None
+        elif raw is not None:
+            body = raw
+        else:
+            body = json.dumps(report).encode("utf-8")
+
+        with self._lock:
+            cursor = self._connection.execute(
+                "SELECT 1 FROM responses WHERE endpoint = ? AND rut = ?",
+                (endpoint, key)
+            )
+            is_new = cursor.fetchone() is None
+
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (endpoint, rut, found, body, fetched_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (endpoint, key, int(found), body, now, now)
+            )
+
+            if is_new:
+                self._size += 1
+
+            if self._size > self.max_entries:
+                self._evict()
+
+            self._connection.commit()
+
+
+    def _evict(self) -> None:
+        '''Remove the least recently used entries. Must hold the lock.
+        Evicts 10% below the cap, so it doesn't run on every insert.'''
+
+        target = int(self.max_entries * 0.9)
+        excess = self._size - target
+
+        self._connection.execute(
+            "DELETE FROM responses WHERE rowid IN "
+            "(SELECT rowid FROM responses ORDER BY last_access LIMIT ?)",
+            (excess,)
+        )
+        self._size = target
+
+
+    def invalidate(self, ruts: list, endpoint: Optional[str] = None) -> None:
+        '''Force a refresh for the given RUTs (on one endpoint or on all)'''
+
+        keys = [(self.normalize_rut(rut),) for rut in ruts]
+
+        with self._lock:
+            if endpoint is None:
+                self._connection.executemany("DELETE FROM responses WHERE rut = ?", keys)
+            else:
+                self._connection.executemany(
+                    "DELETE FROM responses WHERE rut = ? AND endpoint = ?",
+                    [(key, endpoint) for (key,) in keys]
+                )
+            self._connection.commit()
+
+            self._size = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+    def stats(self) -> dict:
+        '''Return the cache counters'''
+
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "entries": self._size
+            }
+
+
+    def print_stats(self, name: str = "") -> None:
+        '''Print the cache counters in a single line'''
+
+        stats = self.stats()
+        print(
+            f"Caché {name}: {stats['hits']} aciertos, "
+            f"{stats['negative_hits']} aciertos 404, "
+            f"{stats['misses']} fallos, {stats['expired']} expirados, "
+            f"{stats['entries']} entradas"
+        )
+
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+def build_response_cache(provider: str, endpoints: list) -> Optional[ResponseCache]:
+    '''Create the cache of a provider from the environment.
+
+    <PROVIDER>_CACHE: "false" disables the cache (enabled by default)
+    <PROVIDER>_CACHE_FILE: SQLite file (default <provider>_cache.sqlite)
+    <PROVIDER>_CACHE_TTL: seconds an answer is valid (default one day)
+    <PROVIDER>_CACHE_TTL_<ENDPOINT>: TTL for one endpoint, e.g. _GETAMLRESULT
+    <PROVIDER>_CACHE_NEGATIVE_TTL: seconds a 404 is valid (default one hour)
+    <PROVIDER>_CACHE_MAX_ENTRIES: size cap for the LRU eviction (default 200000)'''
+
+    if os.getenv(f"{provider}_CACHE", "true").lower() == "false":
+        return None
+
+    default_ttl = float(os.getenv(f"{provider}_CACHE_TTL", "86400"))
+
+    ttls = {}
+    for endpoint in endpoints:
+        value = os.getenv(f"{provider}_CACHE_TTL_{endpoint.upper()}")
+        if value is not None:
+            ttls[endpoint] = float(value)
+
+    return ResponseCache(
+        path=os.getenv(f"{provider}_CACHE_FILE", f"{provider.lower()}_cache.sqlite"),
+        ttls=ttls,
+        default_ttl=default_ttl,
+        negative_ttl=float(os.getenv(f"{provider}_CACHE_NEGATIVE_TTL", "3600")),
+        max_entries=int(os.getenv(f"{provider}_CACHE_MAX_ENTRIES", "200000"))
+    )
@@ -0,0 +1,71 @@
+import time
+import threading
+from typing import Any, Optional
+from library.json_codec import loads
+
+
+class ResponseDecoder:
+    '''Decodes the provider answers straight from the raw response bytes.
+
+    decode returns plain Python objects (orjson when installed, json
+    otherwise), validate goes from bytes to a pydantic model in a single
+    pass through a TypeAdapter (validate_json), with no intermediate dicts.
+    The time spent decoding is measured per endpoint, to see what the
+    parsing of large reports costs next to the network time.'''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+        # endpoint -> [calls, bytes, seconds]
+        self._metrics = {}
+
+
+    def _record(self, endpoint: Optional[str], size: int, elapsed: float) -> None:
+        with self._lock:
+            metrics = self._metrics.setdefault(endpoint or "other", [0, 0, 0.0])
+            metrics[0] += 1
+            metrics[1] += size
+            metrics[2] += elapsed
+
+
+    def decode(self, content: bytes, endpoint: Optional[str] = None) -> Any:
+        '''Decode a JSON answer into Python objects'''
+
+        start = time.perf_counter()
+        data = loads(content)
+        self._record(endpoint, len(content), time.perf_counter() - start)
+        return data
+
+
+    def validate(self, adapter, content: bytes, endpoint: Optional[str] = None) -> Any:
+        '''Decode a JSON answer straight into a model, with a pydantic TypeAdapter'''
+
+        start = time.perf_counter()
+        model = adapter.validate_json(content)
+        self._record(f"{endpoint or 'other'} (modelo)", len(content), time.perf_counter() - start)
+        return model
+
+
+    def stats(self) -> dict:
+        '''Return the decoding counters per endpoint: calls, bytes, seconds
+        and average milliseconds per answer'''
+
+        with self._lock:
+            return {
+                endpoint: {
+                    "calls": calls,
+                    "bytes": size,
+                    "seconds": round(elapsed, 4),
+                    "avg_ms": round(elapsed / calls * 1000, 3) if calls else 0.0
+                }
+                for endpoint, (calls, size, elapsed) in self._metrics.items()
+            }
+
+
+    def print_stats(self, name: str = "") -> None:
+        for endpoint, metrics in self.stats().items():
+            print(
+                f"Decodificación {name}/{endpoint}: {metrics['calls']} respuestas, "
+                f"{metrics['bytes'] / 1024:.0f} KiB, {metrics['seconds']:.2f} s "
+                f"({metrics['avg_ms']:.2f} ms por respuesta)"
+            )
@@ -0,0 +1,141 @@
+import os
+import time
+import random
+import threading
+from typing import Optional
+from email.utils import parsedate_to_datetime
+import requests
+
+
+class RetryPolicy:
+    '''Retry policy shared by the provider clients.
+
+    Transient failures (connection errors, timeouts and the statuses in
+    retry_statuses) are retried with exponential backoff and full jitter.
+    On 429/503 the Retry-After header is honoured when present. Only
+    idempotent calls are retried: GET/HEAD/PUT/DELETE/OPTIONS, or a POST
+    that carries an Idempotency-Key header (or is declared idempotent by the
+    client). Each call has a time budget; a retry that would not fit in it
+    is not attempted.'''
+
+    IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT", "DELETE", "OPTIONS"}
+
+    def __init__(
+            self,
+            max_retries: int = 4,
+            backoff_base: float = 0.5,
+            backoff_max: float = 30.0,
+            budget: float = 60.0,
+            retry_statuses: tuple = (429, 500, 502, 503, 504)
+    ):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.budget = budget
+        self.retry_statuses = set(retry_statuses)
+
+        # Counters
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.gave_up = 0
+
+
+    def is_idempotent(self, method: str, headers: Optional[dict] = None) -> bool:
+        '''Check if a call can be safely repeated'''
+
+        if method.upper() in self.IDEMPOTENT_METHODS:
+            return True
+
+        return any(key.lower() == "idempotency-key" for key in (headers or {}))
+
+
+    def should_retry_status(self, status_code: int) -> bool:
+        '''Check if a status code is worth another attempt'''
+        return status_code in self.retry_statuses
+
+
+    def backoff_delay(self, attempt: int) -> float:
+        '''Exponential backoff with full jitter for the given attempt (0-based)'''
+
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+
+    def next_delay(
+            self,
+            attempt: int,
+            started: float,
+            response: Optional[requests.Response] = None
+    ) -> Optional[float]:
+        '''Return the seconds to wait before the next attempt, or None if the
+        call must give up (no attempts or budget left).'''
+
+        if attempt >= self.max_retries:
+            return None
+
+        delay = None
+
+        # The provider tells us when to come back
+        if response is not None and response.status_code in (429, 503):
+            delay = self._parse_retry_after(response.headers.get("Retry-After"))
+
+        if delay is None:
+            delay = self.backoff_delay(attempt)
+
+        # Do not start a retry that would go beyond the budget of the call
+        if time.monotonic() - started + delay > self.budget:
+            return None
+
+        return delay
+
+
+    def _parse_retry_after(self, value: Optional[str]) -> Optional[float]:
+        '''Retry-After comes either as seconds or as an HTTP date'''
+
+        if not value:
+            return None
+
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+
+        return max(0.0, retry_at.timestamp() - time.time())
+
+
+    def record_retry(self) -> None:
+        with self._lock:
+            self.retries += 1
+
+
+    def record_give_up(self) -> None:
+        with self._lock:
+            self.gave_up += 1
+
+
+    def stats(self) -> dict:
+        '''Return the retry counters'''
+
+        with self._lock:
+            return {"retries": self.retries, "gave_up": self.gave_up}
+
+
+def build_retry_policy() -> RetryPolicy:
+    '''Create a retry policy configured from the environment.
+
+    RETRY_MAX: retries per call (default 4)
+    RETRY_BACKOFF_BASE: first backoff ceiling in seconds (default 0.5)
+    RETRY_BACKOFF_MAX: maximum backoff in seconds (default 30)
+    RETRY_BUDGET: maximum seconds spent on a call, retries included (default 60)'''
+
+    return RetryPolicy(
+        max_retries=int(os.getenv("RETRY_MAX", "4")),
+        backoff_base=float(os.getenv("RETRY_BACKOFF_BASE", "0.5")),
+        backoff_max=float(os.getenv("RETRY_BACKOFF_MAX", "30")),
+        budget=float(os.getenv("RETRY_BUDGET", "60"))
+    )
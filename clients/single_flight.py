@@ -0,0 +1,60 @@
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable
+
+
+class SingleFlight:
+    '''Coalesce identical calls that are in flight at the same time.
+
+    The first caller for a key (the leader) runs the call; callers that
+    arrive with the same key while it is still running wait for the
+    leader's result instead of issuing their own request. The result (or
+    the exception) is shared by all of them. Once the call finishes the key
+    is released, so later calls run normally.'''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = {}
+
+        # Counters
+        self.calls = 0
+        self.saved = 0
+
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        '''Run fn(*args, **kwargs), or join the identical call in flight'''
+
+        with self._lock:
+            self.calls += 1
+            future = self._in_flight.get(key)
+
+            if future is not None:
+                self.saved += 1
+                leader = False
+            else:
+                future = Future()
+                self._in_flight[key] = future
+                leader = True
+
+        # Followers wait for the leader (and get its exception, if any)
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+
+    def stats(self) -> dict:
+        '''Return the counters: calls received and calls saved'''
+
+        with self._lock:
+            return {"coalesced_calls": self.calls, "saved_calls": self.saved}
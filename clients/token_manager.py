@@ -0,0 +1,161 @@
+import os
+import json
+import time
+import threading
+from typing import Callable, Optional
+
+
+class TokenManager:
+    '''Expiry-aware cache for OAuth tokens.
+
+    Each kind of token ("natural", "juridica", ...) has a fetcher that
+    returns (access_token, expires_in). Tokens are reused until shortly
+    before they expire, and a background thread refreshes them ahead of
+    time. Refreshes are single-flight: when several workers need a new
+    token at the same moment only one of them calls the service, the rest
+    wait for its result. Optionally the tokens are persisted to a local
+    JSON file so a new run can reuse them.'''
+
+    def __init__(
+            self,
+            fetchers: dict[str, Callable[[], tuple[str, int]]],
+            cache_file: Optional[str] = None,
+            refresh_margin: int = 60
+    ):
+        self.fetchers = fetchers
+        self.cache_file = cache_file
+        self.refresh_margin = refresh_margin
+
+        # kind -> {"access_token": str, "expires_at": epoch seconds}
+        self.tokens = {}
+
+        # One lock per kind, so each kind is refreshed by one caller at a time
+        self._locks = {kind: threading.Lock() for kind in fetchers}
+        self._file_lock = threading.Lock()
+
+        self._stop = threading.Event()
+        self._refresher = None
+
+        self._load_cache()
+
+
+    def _is_fresh(self, kind: str) -> bool:
+        '''Check if the cached token is still valid (with the safety margin)'''
+        token = self.tokens.get(kind)
+        return token is not None and token["expires_at"] - self.refresh_margin > time.time()
+
+
+    def get(self, kind: str) -> str:
+        '''Return a valid token, refreshing it if needed'''
+
+        if self._is_fresh(kind):
+            return self.tokens[kind]["access_token"]
+
+        with self._locks[kind]:
+            # Another caller may have refreshed it while we waited
+            if not self._is_fresh(kind):
+                self._refresh(kind)
+
+            return self.tokens[kind]["access_token"]
+
+
+    def invalidate(self, kind: str, stale_token: str) -> str:
+        '''Discard a token rejected by the service (401) and return a new one.
+        If another caller already replaced it, the new token is reused.'''
+
+        with self._locks[kind]:
+            current = self.tokens.get(kind)
+            if current is None or current["access_token"] == stale_token:
+                self._refresh(kind)
+
+            return self.tokens[kind]["access_token"]
+
+
+    def _refresh(self, kind: str) -> None:
+        '''Call the fetcher for a kind of token. Must hold the kind's lock.'''
+
+        access_token, expires_in = self.fetchers[kind]()
+
+        self.tokens[kind] = {
+            "access_token": access_token,
+            "expires_at": time.time() + expires_in
+        }
+
+        self._save_cache()
+
+
+    def start_background_refresh(self) -> None:
+        '''Start a daemon thread that refreshes tokens before they expire'''
+
+        if self._refresher is not None and self._refresher.is_alive():
+            return
+
+        self._stop.clear()
+        self._refresher = threading.Thread(target=self._refresh_loop, daemon=True)
+        self._refresher.start()
+
+
+    def stop_background_refresh(self) -> None:
+        '''Stop the background refresh thread'''
+
+        self._stop.set()
+        if self._refresher is not None:
+            self._refresher.join()
+            self._refresher = None
+
+
+    def _refresh_loop(self) -> None:
+        '''Refresh the tokens that are due and sleep until the next one'''
+
+        while not self._stop.is_set():
+            for kind in self.fetchers:
+                if self._is_fresh(kind):
+                    continue
+
+                with self._locks[kind]:
+                    if not self._is_fresh(kind):
+                        try:
+                            self._refresh(kind)
+                        except Exception as e:
+                            # Callers will still refresh on demand through get()
+                            print(f"No se pudo renovar el token {kind}: {e}")
+
+            # Wake up when the first token enters the safety margin
+            # (at least a few seconds, to avoid spinning if the service fails)
+            dues = [
+                self.tokens[kind]["expires_at"] - self.refresh_margin
+                for kind in self.fetchers if kind in self.tokens
+            ]
+            wait = min(dues) - time.time() if len(dues) == len(self.fetchers) else 0
+            self._stop.wait(max(5.0, wait))
+
+
+    def _load_cache(self) -> None:
+        '''Load tokens persisted by a previous run, if any'''
+
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+
+        try:
+            with open(self.cache_file, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"No se pudo leer el caché de tokens {self.cache_file}: {e}")
+            return
+
+        for kind in self.fetchers:
+            if kind in data:
+                self.tokens[kind] = data[kind]
+
+
+    def _save_cache(self) -> None:
+        '''Persist the tokens, replacing the file atomically'''
+
+        if not self.cache_file:
+            return
+
+        with self._file_lock:
+            temp_path = self.cache_file + ".tmp"
+            with open(temp_path, "w") as f:
+                json.dump(self.tokens, f)
+            os.replace(temp_path, self.cache_file)
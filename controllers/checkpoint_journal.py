@@ -0,0 +1,147 @@
+import os
+import json
+import time
+import threading
+from typing import Optional
+import pandas as pd
+
+
+class CheckpointJournal:
+    '''Append-only journal of the row changes made by a workflow.
+
+    Every time a RUT is completed, the new values of its row are appended as
+    one JSON line and flushed to disk, so the cost of a checkpoint doesn't
+    grow with the size of the file. The workbook itself is written only at
+    the end of the workflow (or on demand); after a crash, replaying the
+    journal over the last saved workbook recovers the work done since then.
+    Rows are identified by RUT, not by position, so the journal survives a
+    change in the order of the rows.'''
+
+    def __init__(self, path: str, fsync: bool = True):
+        self.path = path
+        self.fsync = fsync
+        self.records = 0
+
+        self._lock = threading.Lock()
+        self._file = None
+
+
+    def _open(self):
+        '''Open the journal for appending. Must hold the lock.'''
+
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        return self._file
+
+
+    @staticmethod
+    def _to_json_value(value):
+        '''numpy scalars (int64, float64, bool_) are not JSON serializable'''
+
+        if hasattr(value, "item"):
+            return value.item()
+        return value
+
+
+    def record(self, rut: str, values: dict) -> None:
+        '''Append the new values of a row'''
+
+        line = json.dumps(
+            {
+                "rut": str(rut),
+                "values": {column: self._to_json_value(value) for column, value in values.items()},
+                "ts": time.time()
+            },
+            ensure_ascii=False,
+            default=str
+        )
+
+        with self._lock:
+            journal = self._open()
+            journal.write(line + "\n")
+            journal.flush()
+
+            # Make the record survive a crash of the machine, not only of the process
+            if self.fsync:
+                os.fsync(journal.fileno())
+
+            self.records += 1
+
+
+    def replay(self, df: pd.DataFrame, key_column: str = 'Rut', defaults: Optional[dict] = None) -> int:
+        '''Apply the journal over the DataFrame, in order. Returns the number
+        of records applied. A line cut in half by a crash is ignored.
+
+        A column the DataFrame doesn't have yet (the workflow created it
+        after the last save) is added with its value in defaults, the one a
+        row without results has, or empty. The rows the journal doesn't
+        touch must look unprocessed, not done.'''
+
+        defaults = defaults or {}
+
+        if not os.path.exists(self.path):
+            return 0
+
+        # RUT -> index of its row
+        positions = {str(rut): index for index, rut in df[key_column].items()}
+
+        applied = 0
+        with open(self.path, "r", encoding="utf-8") as journal:
+            for line in journal:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"Registro incompleto en el journal {self.path}, ignorado")
+                    continue
+
+                index = positions.get(record["rut"])
+                if index is None:
+                    continue
+
+                for column, value in record["values"].items():
+                    if column not in df.columns:
+                        df[column] = defaults.get(column)
+                    df.at[index, column] = value
+
+                applied += 1
+
+        return applied
+
+
+    def pending_records(self) -> bool:
+        '''Check if there is work recorded that is not in the workbook yet'''
+        return os.path.exists(self.path) and os.path.getsize(self.path) > 0
+
+
+    def clear(self) -> None:
+        '''Discard the journal, once its changes are saved in the workbook'''
+
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+            self.records = 0
+
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def build_checkpoint_journal(excel_file: str) -> CheckpointJournal:
+    '''Create the journal of a workbook from the environment.
+
+    CHECKPOINT_JOURNAL: journal file (default <workbook>.journal.jsonl)
+    CHECKPOINT_FSYNC: "false" skips the fsync of every record (faster, but
+    a crash of the machine may lose the last records)'''
+
+    path = os.getenv("CHECKPOINT_JOURNAL", f"{excel_file}.journal.jsonl")
+    fsync = os.getenv("CHECKPOINT_FSYNC", "true").lower() != "false"
+
+    return CheckpointJournal(path, fsync=fsync)
@@ -0,0 +1,219 @@
+import os
+import json
+import time
+import threading
+from dataclasses import dataclass
+from typing import Callable
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class CompletenessRule:
+    '''A completeness rule over the stats output.
+
+    predicate receives the whole column and returns a boolean Series, so
+    every rule is evaluated vectorized. Rules with in_all=False are only
+    informative: they are reported, but are not part of "all the rules".'''
+
+    name: str
+    description: str   # completes "Porcentaje de filas ..." in the printout
+    column: str
+    predicate: Callable[[pd.Series], pd.Series]
+    in_all: bool = True
+
+    def evaluate(self, df: pd.DataFrame) -> pd.Series:
+        return self.predicate(df[self.column]).fillna(False).astype(bool)
+
+
+def at_least(minimum: float) -> Callable[[pd.Series], pd.Series]:
+    '''The column has a number >= minimum (empty counts as 0)'''
+    return lambda column: pd.to_numeric(column, errors="coerce").fillna(0) >= minimum
+
+
+def equals(value) -> Callable[[pd.Series], pd.Series]:
+    '''The column has exactly this value (empty counts as 0)'''
+    return lambda column: pd.to_numeric(column, errors="coerce").fillna(0) == value
+
+
+def present() -> Callable[[pd.Series], pd.Series]:
+    '''The column has a value, and it isn't "N/A"'''
+    return lambda column: column.notna() & (column != "N/A")
+
+
+def is_value(value) -> Callable[[pd.Series], pd.Series]:
+    '''The column has exactly this text'''
+    return lambda column: column == value
+
+
+# The rules of the stats output. Add a rule here to have it evaluated,
+# printed and written to the summaries.
+COMPLETENESS_RULES = [
+    CompletenessRule("Al menos 1 actividad", "con al menos 1 actividad", "Actividades", at_least(1)),
+    CompletenessRule("País válido", "con país válido", "País", present()),
+    CompletenessRule("Tipo de compañía válido", "con tipo de compañía válido", "Tipo_compañia", present()),
+    CompletenessRule("Fecha de constitución válida", "con fecha de constitución válida", "Fecha_constitución", present()),
+    CompletenessRule("Al menos 1 gerente", "con al menos 1 gerente", "Gerentes", at_least(1)),
+    CompletenessRule("Al menos 1 representante", "con al menos 1 representante", "Representantes", at_least(1)),
+    CompletenessRule("Al menos 1 accionista", "con al menos 1 accionista", "Accionistas", at_least(1)),
+    CompletenessRule("Participación total = 100%", "con participación total del 100%", "Total_participación", equals(100.0)),
+    CompletenessRule(
+        "Datos obtenidos de registro electrónico",
+        "declaradas en registro electrónico",
+        "Fuente",
+        is_value("Registro Electrónico"),
+        in_all=False
+    ),
+]
+
+ALL_RULES = "TODAS las reglas"
+
+# Breakdowns written to their own sheet
+BREAKDOWN_COLUMNS = ["Fuente", "Tipo_compañia"]
+
+
+def register_rule(rule: CompletenessRule) -> None:
+    '''Add a rule to the registry (replacing one with the same name)'''
+
+    COMPLETENESS_RULES[:] = [existing for existing in COMPLETENESS_RULES if existing.name != rule.name]
+    COMPLETENESS_RULES.append(rule)
+
+
+def completeness_scope(df: pd.DataFrame) -> pd.DataFrame:
+    '''Rows the rules apply to: with RUT, and not natural persons'''
+
+    df = df[df["RUT"].notna()]
+    return df[df["Fuente"] != "Persona natural"]
+
+
+def evaluate_rules(df: pd.DataFrame, rules: list = None) -> pd.DataFrame:
+    '''Evaluate every rule in one pass. Returns a boolean matrix with one
+    column per rule, plus the "all the rules" column.'''
+
+    rules = COMPLETENESS_RULES if rules is None else rules
+
+    matrix = pd.DataFrame({rule.name: rule.evaluate(df) for rule in rules}, index=df.index)
+
+    in_all = [rule.name for rule in rules if rule.in_all]
+    informative = [rule.name for rule in rules if not rule.in_all]
+    matrix[ALL_RULES] = matrix[in_all].all(axis=1) if in_all else False
+
+    # The combined column goes after the rules it combines
+    return matrix[in_all + [ALL_RULES] + informative]
+
+
+def summarize(df: pd.DataFrame, matrix: pd.DataFrame) -> dict:
+    '''Percentages of the rule matrix: overall ("Resumen") and broken down
+    by each of BREAKDOWN_COLUMNS ("Por <column>"). Returns sheet -> DataFrame.'''
+
+    total_rows = len(matrix)
+    rates = (matrix.mean() * 100).round(2) if total_rows else matrix.sum() * 0.0
+
+    sheets = {
+        "Resumen": pd.DataFrame({"Regla": rates.index, "Porcentaje": rates.values})
+    }
+
+    for column in BREAKDOWN_COLUMNS:
+        if column not in df.columns:
+            continue
+
+        groups = matrix.groupby(df[column].fillna("N/A"))
+        breakdown = (groups.mean() * 100).round(2)
+        breakdown.insert(0, "Filas", groups.size())
+        sheets[f"Por {column}"] = breakdown.reset_index()
+
+    return sheets
+
+
+class CompletenessTracker:
+    '''Running completeness counters, updated while run_stats executes.
+
+    Each batch of stats rows is evaluated with the same rules as
+    check_completeness, and only the counters are kept: the number of rows
+    in scope, how many pass each rule, and the same broken down by Fuente.
+    The live summary is available in process (snapshot) and, when a
+    status_file is given, as a small JSON file rewritten after each batch,
+    so a long run can be followed without reading its output.'''
+
+    def __init__(self, status_file: str = None, rules: list = None):
+        self.status_file = status_file
+        self.rules = rules
+
+        self._lock = threading.Lock()
+        self.total = 0
+        self.passed = {}
+        self.by_source = {}
+
+
+    def update(self, rows: list) -> None:
+        '''Add a batch of stats rows (dicts with the stats columns)'''
+
+        if not rows:
+            return
+
+        df = completeness_scope(pd.DataFrame(rows))
+        matrix = evaluate_rules(df, self.rules)
+
+        # Vectorized over the batch: totals and totals per source
+        passed = matrix.sum()
+        sources = df["Fuente"].fillna("N/A")
+        by_source = matrix.groupby(sources).sum()
+        source_rows = sources.value_counts()
+
+        with self._lock:
+            self.total += len(df)
+
+            for rule, count in passed.items():
+                self.passed[rule] = self.passed.get(rule, 0) + int(count)
+
+            for source, counts in by_source.iterrows():
+                entry = self.by_source.setdefault(source, {"rows": 0, "passed": {}})
+                entry["rows"] += int(source_rows[source])
+                for rule, count in counts.items():
+                    entry["passed"][rule] = entry["passed"].get(rule, 0) + int(count)
+
+            snapshot = self._snapshot()
+
+        if self.status_file:
+            self._write_status(snapshot)
+
+
+    def _snapshot(self) -> dict:
+        '''Build the summary. Must hold the lock.'''
+
+        def rates(passed: dict, rows: int) -> dict:
+            return {rule: round(count / rows * 100, 2) if rows else 0.0 for rule, count in passed.items()}
+
+        return {
+            "updated_at": time.time(),
+            "rows": self.total,
+            "rates": rates(self.passed, self.total),
+            "by_source": {
+                source: {"rows": entry["rows"], "rates": rates(entry["passed"], entry["rows"])}
+                for source, entry in self.by_source.items()
+            }
+        }
+
+
+    def snapshot(self) -> dict:
+        '''Return the live summary: rows in scope, rate of each rule and the
+        same per Fuente'''
+
+        with self._lock:
+            return self._snapshot()
+
+
+    def _write_status(self, snapshot: dict) -> None:
+        '''Replace the status file atomically, so readers never see half of it'''
+
+        temp_path = f"{self.status_file}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as status:
+            json.dump(snapshot, status, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.status_file)
+
+
+    def print_summary(self) -> None:
+        '''Print the live rates in a single line'''
+
+        snapshot = self.snapshot()
+        all_rules = snapshot["rates"].get(ALL_RULES, 0.0)
+        print(f"Completitud parcial: {snapshot['rows']} filas, {all_rules}% cumplen todas las reglas")
@@ -1,13 +1,26 @@
 from controllers.output_controller import OutputController
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from clients.gesintel_client import get_gestintel_client
-from library.gesintel_components import AMLResultResponse
+from library.gesintel_components import AMLResultResponse, classify_aml_result, classify_aml_report
+from clients.circuit_breaker import CircuitOpenError
+from library.rut import normalize_rut
+import os
 
 class GesintelController:
-    def __init__(self, gesintel_client):
+    def __init__(self, gesintel_client, validate: bool = None):
         self.gesintel_client = gesintel_client
         self.output_controller = None
 
+        # Audit mode: validate every response into the pydantic model
+        # (GESINTEL_VALIDATE=true). Off by default, the fast path is enough
+        if validate is None:
+            validate = os.getenv("GESINTEL_VALIDATE", "false").lower() == "true"
+        self.validate = validate
+
+        # Set by the concurrent check when rows were parked by an open circuit
+        self.circuit_error = None
+
     def get_output_controller(self) -> None:
         """
         Returns the OutputController instance.
@@ -21,7 +34,8 @@ class GesintelController:
                 )
             
 
-    def check_watchlists(self, row: pd.Series, index: int) -> pd.Series:
+    def _prepare_check(self) -> None:
+        '''Make sure the client and the output file (with headers) are ready'''
 
         # Get the client if it's not yect created
         if self.gesintel_client is None:
@@ -30,10 +44,6 @@ class GesintelController:
         # Create the output controller to handle the writing to file
         self.get_output_controller()
 
-        # Get the RUT, both the original and modified version
-        rut_original = str(row['Rut'])
-        rut = rut_original.replace("-", "")
-
         # Add headers to the output file if needed
         if not self.output_controller.headers:
             header = [
@@ -53,146 +63,148 @@ class GesintelController:
 
             self.output_controller.write_headers(header)
 
-        
-        # Check if the row is already processed
-        if row['PEP Ges'] != "S/I" and row['Watch Ges'] != "S/I" and row['PJ Ges'] != "S/I":
-            print(f"Comercio en índice {index} con RUT y ID {id} ya fue validado. Lo omitiremos")
-            return None
 
-        # List all the potential hits (for later dumping into the output file)
-        hit_data = [rut_original, "No", "No", "No", "No", "No", "No","No", "No", "No", "No", "No"]
+    def _get_aml_result(self, rut: str) -> tuple:
+        '''getAMLResult as raw JSON, or as the validated model in audit mode'''
+
+        if self.validate:
+            return self.gesintel_client.get_aml_result_report(rut)
+        return self.gesintel_client.get_aml_result(rut)
+
+
+    def _is_processed(self, row: pd.Series) -> bool:
+        '''Check if the row already has Gesintel results'''
+        return row['PEP Ges'] != "S/I" and row['Watch Ges'] != "S/I" and row['PJ Ges'] != "S/I"
+
+
+    def check_watchlists(self, row: pd.Series, index: int) -> pd.Series:
+
+        self._prepare_check()
 
-        # Collect hits and conditions
-        found_hits = []
-        found_pep = False
-        found_watchlist = False
-        found_pj = False
+        # Get the RUT, both the original and modified version
+        rut_original = str(row['Rut'])
+        rut = normalize_rut(rut_original)
+
+        # Check if the row is already processed
+        if self._is_processed(row):
+            print(f"Comercio en índice {index} con RUT {rut_original} ya fue validado. Lo omitiremos")
+            return None
 
         try:
             # Get the report
-            found, json = self.gesintel_client.get_aml_result(rut)
-
-            if found:
-                # print(f"Reporte encontrado para RUT {rut}. Convirtiendo a objeto...")
-                # Convert to object
-                report = AMLResultResponse.model_validate(json)
-
-                # Check each of the results. There might be multiple hits.
-                # Determine if PEP related or watchlist related
-                if report.results.pepCResults:
-                    hit_data[1] = "Si"
-                    found_hits.append("PEP")
-                    found_pep = True
-
-                if report.results.pepHResults:
-                    hit_data[2] = "Si"
-                    found_hits.append("PEP Histórico")
-                    found_pep = True
-
-                if report.results.pepCResults:
-                    hit_data[3] = "Si"
-                    found_hits.append("PEP Candidato")
-                    found_pep = True
-
-                if report.results.fpResults:
-                    hit_data[4] = "Si"
-                    found_hits.append("fp")
-                    found_pep = True
-
-                if report.results.pjudResults:
-                    hit_data[5] = "Si"
-                    found_hits.append("Poder judicial")
-                    # found_watchlist = True
-                    found_pj = True
-
-                if report.results.personResults:
-                    hit_data[6] = "Si"
-                    found_hits.append("PEP")
-                    found_watchlist = True
-
-                # if (report.results.djResults and 
-                #     report.results.djResults.wlResults and 
-                #     len(report.results.djResults.wlResults) > 0):
-                #     hit_data[7] = "Si"
-                #     found_hits.append("dj")
-                #     found_pep = True
-
-                # This is the logic that will capture watchlist hits
-                if report.results and report.results.djResults:
-                    dj_results = report.results.djResults
-                    
-                    # Check if wlResults exists and has content (WATCHLIST)
-                    wl_exists = ('wlResults' in dj_results and 
-                                dj_results['wlResults'] is not None and 
-                                len(dj_results['wlResults']) > 0)
-                    
-                    # Check if ameResults exists and has content (WATCHLIST)
-                    ame_exists = ('ameResults' in dj_results and 
-                                dj_results['ameResults'] is not None and 
-                                len(dj_results['ameResults']) > 0)
-                    
-                    # Check if socResults exists and has content (PEP)
-                    soc_exists = ('socResults' in dj_results and 
-                                dj_results['socResults'] is not None and 
-                                len(dj_results['socResults']) > 0)
-                    
-                    # Set flags based on conditions
-                    if wl_exists or ame_exists:
-                        found_watchlist = True # Found watchlist hit
-                        hit_data[7] = "Si"  # Assuming this is for watchlist hits
-                        found_hits.append("dj")
-                    
-                    if soc_exists:
-                        hit_data[7] = "Si"
-                        found_pep = True # Found state owned conpany, is PEP
-                        found_hits.append("dj")
-
-                if report.results.negativeResults:
-                    hit_data[8] = "Si"
-                    found_hits.append("Negative")
-                    found_watchlist = True
-
-                if report.results.vipResults:
-                    hit_data[9] = "Si"
-                    found_hits.append("VIP")
-                    found_pep = True
-                    
-                if report.results.pepRelacionados:
-                    hit_data[10] = "Si"
-                    found_hits.append("PEP Relacionado")
-                    found_pep = True
-
-                if report.results.pepHRelacionados:
-                    hit_data[11] = "Si"
-                    found_hits.append("PEP Histórico Rel")
-                    found_pep = True
-                
-                
-                self.output_controller.write_output(hit_data)
-                
-                # If any hits were found, notate them in row,
-                # according to PEP or watchlist (or both)
-                if found_hits:
-                    print(f"Índice {index}, RUT {rut_original} --- ENCONTRADO, escribiendo en archivo de salida")
-                    row['PEP Ges'] = "Si" if found_pep else "No"
-                    row['Watch Ges'] = "Si" if found_watchlist else "No"
-                    row['PJ Ges'] = "Si" if found_pj else "No"
-                
-                # If not, declare not found in row
-                else:
-                    print(f"Índice {index}, RUT {rut_original} --- no encontrado... escribiendo en archivo de salida")
-                    row['PEP Ges'] = "No"
-                    row['Watch Ges'] = "No"
-                    row['PJ Ges'] = "No"
-
-                return row
+            found, json = self._get_aml_result(rut)
+
+            return self._apply_aml_result(row, index, found, json)
 
+        except CircuitOpenError:
+            # Let the workflow pause instead of skipping the row
+            raise
 
         except Exception as e:
             print(f"Error processing RUT {rut}: {e}")
             return None
-        
-        
+
+
+    def check_watchlists_concurrently(self, block: pd.DataFrame, max_workers: int) -> list[tuple[int, pd.Series]]:
+        '''Check the watchlists for a whole block, keeping up to max_workers
+        getAMLResult calls in flight at the same time.
+
+        The results are applied (and written to the output file) in the
+        original order of the block, so the output matches the sequential run.
+        Returns the list of (index, updated row) for the rows that changed.
+        Rows refused by an open circuit are left untouched (parked) and
+        circuit_error is set, so the workflow can pause and retry them.'''
+
+        self._prepare_check()
+        self.circuit_error = None
+
+        # Only the rows without Gesintel results need a call
+        pending = []
+        for index, row in block.iterrows():
+            if self._is_processed(row):
+                print(f"Comercio en índice {index} con RUT {row['Rut']} ya fue validado. Lo omitiremos")
+            else:
+                pending.append((index, row))
+
+        if not pending:
+            return []
+
+        # Send all the calls of the block, bounded by the number of workers
+        responses = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self._get_aml_result, normalize_rut(row['Rut'])): index
+                for index, row in pending
+            }
+
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    responses[index] = future.result()
+                except CircuitOpenError as e:
+                    self.circuit_error = e
+                except Exception as e:
+                    print(f"Error processing RUT en índice {index}: {e}")
+
+        # Apply the results in the original order of the block
+        updated_rows = []
+        for index, row in pending:
+            if index not in responses:
+                continue
+
+            found, json = responses[index]
+
+            try:
+                updated_row = self._apply_aml_result(row, index, found, json)
+            except Exception as e:
+                print(f"Error processing RUT {row['Rut']}: {e}")
+                continue
+
+            if updated_row is not None:
+                updated_rows.append((index, updated_row))
+
+        return updated_rows
+
+
+    def _apply_aml_result(self, row: pd.Series, index: int, found: bool, json: dict) -> pd.Series:
+        '''Classify the hits of a getAMLResult response, write them to the
+        output file and update the control columns of the row.
+        Returns None if the report was not found.'''
+
+        rut_original = str(row['Rut'])
+
+        if found:
+            # Classify straight from the raw JSON. In audit mode the answer
+            # comes validated into the model, and is classified from it
+            if isinstance(json, AMLResultResponse):
+                summary = classify_aml_report(json)
+            else:
+                summary = classify_aml_result(json)
+
+            # List all the potential hits (for dumping into the output file)
+            hit_data = [rut_original] + summary.hits
+            found_hits = summary.found_hits
+            found_pep = summary.pep
+            found_watchlist = summary.watchlist
+            found_pj = summary.pj
+
+            self.output_controller.write_output(hit_data)
+            
+            # If any hits were found, notate them in row,
+            # according to PEP or watchlist (or both)
+            if found_hits:
+                print(f"Índice {index}, RUT {rut_original} --- ENCONTRADO, escribiendo en archivo de salida")
+                row['PEP Ges'] = "Si" if found_pep else "No"
+                row['Watch Ges'] = "Si" if found_watchlist else "No"
+                row['PJ Ges'] = "Si" if found_pj else "No"
             
+            # If not, declare not found in row
+            else:
+                print(f"Índice {index}, RUT {rut_original} --- no encontrado... escribiendo en archivo de salida")
+                row['PEP Ges'] = "No"
+                row['Watch Ges'] = "No"
+                row['PJ Ges'] = "No"
+
+            return row
 
-    
\ No newline at end of file
+        return None
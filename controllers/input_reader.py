@@ -0,0 +1,250 @@
+import os
+import json
+import hashlib
+import tempfile
+import shutil
+from typing import Iterator, Optional
+import pandas as pd
+
+
+EXCEL_EXTENSIONS = (".xlsx", ".xlsm", ".xls")
+
+
+def _extension(path: str) -> str:
+    return os.path.splitext(path)[1].lower()
+
+
+def _sidecar_enabled() -> bool:
+    '''INPUT_CACHE: "false" disables the Parquet copy of Excel inputs'''
+    return os.getenv("INPUT_CACHE", "true").lower() != "false"
+
+
+def _sidecar_paths(path: str) -> tuple[str, str]:
+    '''Parquet copy of a workbook and the file with its fingerprint'''
+    return f"{path}.parquet", f"{path}.parquet.json"
+
+
+def _file_hash(path: str) -> str:
+    '''SHA-256 of a file, read in chunks'''
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for chunk in iter(lambda: source.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _fingerprint(path: str, file_hash: Optional[str] = None) -> dict:
+    stat = os.stat(path)
+    return {
+        "mtime": stat.st_mtime,
+        "size": stat.st_size,
+        "sha256": file_hash if file_hash else _file_hash(path)
+    }
+
+
+def _read_sidecar(path: str, columns: Optional[list]) -> Optional[pd.DataFrame]:
+    '''Return the cached copy of a workbook if it is still valid.
+    A different mtime alone doesn't invalidate it: the hash decides (a
+    workbook copied or touched without changes keeps its cache).'''
+
+    parquet_path, meta_path = _sidecar_paths(path)
+
+    if not (os.path.exists(parquet_path) and os.path.exists(meta_path)):
+        return None
+
+    try:
+        with open(meta_path, "r", encoding="utf-8") as meta_file:
+            cached = json.load(meta_file)
+
+        stat = os.stat(path)
+        if stat.st_size != cached["size"]:
+            return None
+
+        if stat.st_mtime != cached["mtime"]:
+            if _file_hash(path) != cached["sha256"]:
+                return None
+
+            # Same content: remember the new mtime to skip the hash next time
+            cached["mtime"] = stat.st_mtime
+            with open(meta_path, "w", encoding="utf-8") as meta_file:
+                json.dump(cached, meta_file)
+
+        return pd.read_parquet(parquet_path, columns=columns)
+
+    except Exception as e:
+        # pyarrow missing, cache corrupted... the workbook is the source of truth
+        print(f"No se pudo usar la caché de {path}: {e}")
+        return None
+
+
+def refresh_sidecar(df: pd.DataFrame, path: str) -> None:
+    '''Store the DataFrame as the Parquet copy of the workbook at path.
+    Call it right after writing the workbook, with the same data.'''
+
+    if not _sidecar_enabled() or _extension(path) not in EXCEL_EXTENSIONS:
+        return
+
+    parquet_path, meta_path = _sidecar_paths(path)
+
+    try:
+        df.to_parquet(parquet_path, index=False)
+        with open(meta_path, "w", encoding="utf-8") as meta_file:
+            json.dump(_fingerprint(path), meta_file)
+
+    except Exception as e:
+        # Mixed types in a column, pyarrow missing... the next load reads the workbook
+        print(f"No se pudo guardar la caché de {path}: {e}")
+        for stale in (parquet_path, meta_path):
+            if os.path.exists(stale):
+                os.remove(stale)
+
+
+def read_table(path: str, columns: Optional[list] = None) -> pd.DataFrame:
+    '''Load a customer file, detecting the format by its extension:
+    .csv, .parquet, .feather or Excel (.xlsx/.xlsm/.xls).
+
+    With columns, only those columns are read (all of them must exist).
+    Excel files are also stored as a Parquet copy next to them, used
+    while the workbook doesn't change, so repeated loads skip openpyxl.'''
+
+    extension = _extension(path)
+
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+
+    if extension == ".csv":
+        return pd.read_csv(path, usecols=columns)
+
+    if extension == ".parquet":
+        return pd.read_parquet(path, columns=columns)
+
+    if extension == ".feather":
+        return pd.read_feather(path, columns=columns)
+
+    if extension not in EXCEL_EXTENSIONS:
+        raise ValueError(f"Formato de archivo no soportado: {path}")
+
+    if _sidecar_enabled():
+        df = _read_sidecar(path, columns)
+        if df is not None:
+            print(f"Usando caché Parquet de {path}")
+            return df
+
+    # The copy must have every column, so the whole sheet is read
+    df = pd.read_excel(path)
+    refresh_sidecar(df, path)
+
+    return df[columns] if columns else df
+
+
+def _iter_excel_batches(path: str, batch_size: int, columns: Optional[list]) -> Iterator[pd.DataFrame]:
+    '''Read a workbook row by row with the read-only openpyxl iterator'''
+
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(name) for name in next(rows, ())]
+
+        # Positions of the columns to keep
+        if columns:
+            missing = [column for column in columns if column not in header]
+            if missing:
+                raise ValueError(f"Columnas no encontradas en {path}: {missing}")
+            positions = [header.index(column) for column in columns]
+        else:
+            columns = header
+            positions = list(range(len(header)))
+
+        batch = []
+        for row in rows:
+            # Trailing empty rows of the sheet
+            if not any(value is not None for value in row):
+                continue
+
+            batch.append([row[position] if position < len(row) else None for position in positions])
+
+            if len(batch) == batch_size:
+                yield pd.DataFrame(batch, columns=columns)
+                batch = []
+
+        if batch:
+            yield pd.DataFrame(batch, columns=columns)
+
+    finally:
+        workbook.close()
+
+
+def iter_batches(path: str, batch_size: int = 5000, columns: Optional[list] = None) -> Iterator[pd.DataFrame]:
+    '''Read a customer file in batches of up to batch_size rows, so memory
+    stays flat no matter the size of the file. Formats as in read_table.
+    The index of each batch is the position of its rows in the file.'''
+
+    extension = _extension(path)
+
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+
+    if extension == ".csv":
+        batches = pd.read_csv(path, usecols=columns, chunksize=batch_size)
+
+    elif extension == ".parquet":
+        import pyarrow.parquet
+
+        parquet_file = pyarrow.parquet.ParquetFile(path)
+        batches = (
+            record_batch.to_pandas()
+            for record_batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns)
+        )
+
+    elif extension == ".feather":
+        import pyarrow.ipc
+
+        # Feather v2 is an Arrow IPC file: one record batch at a time
+        reader = pyarrow.ipc.open_file(path)
+        batches = (
+            reader.get_batch(position).to_pandas()[columns] if columns
+            else reader.get_batch(position).to_pandas()
+            for position in range(reader.num_record_batches)
+        )
+
+    elif extension in EXCEL_EXTENSIONS:
+        batches = _iter_excel_batches(path, batch_size, columns)
+
+    else:
+        raise ValueError(f"Formato de archivo no soportado: {path}")
+
+    # Number the rows by their position in the whole file
+    offset = 0
+    for batch in batches:
+        batch.index = pd.RangeIndex(offset, offset + len(batch))
+        offset += len(batch)
+        yield batch
+
+
+def write_table(df: pd.DataFrame, path: str) -> None:
+    '''Write the DataFrame in the format of path. The data goes to a temp
+    file first and then replaces the original, so a failure (or a workbook
+    open in Excel) never leaves a half-written file.'''
+
+    extension = _extension(path)
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix=extension) as tmp:
+        temp_path = tmp.name
+
+    if extension == ".csv":
+        df.to_csv(temp_path, index=False)
+    elif extension == ".parquet":
+        df.to_parquet(temp_path, index=False)
+    elif extension == ".feather":
+        df.reset_index(drop=True).to_feather(temp_path)
+    else:
+        df.to_excel(temp_path, index=False, engine='openpyxl')
+
+    # Overwrite the original file
+    shutil.move(temp_path, path)
+
+    refresh_sidecar(df, path)
@@ -0,0 +1,208 @@
+import os
+import time
+import sqlite3
+import threading
+from typing import Optional
+
+
+class JobStateStore:
+    '''Persistent state of the work done for each RUT, per stage.
+
+    Every (stage, RUT) pair has a status: pending, in_flight, done or
+    failed, with the number of finished attempts and the last error. The
+    workflows get their pending set with a single indexed query instead of
+    scanning every row for sentinel values, so a restarted run goes straight
+    to the remaining work. RUTs must be given already normalized.'''
+
+    PENDING = "pending"
+    IN_FLIGHT = "in_flight"
+    DONE = "done"
+    FAILED = "failed"
+
+    def __init__(self, path: str, max_attempts: int = 3):
+        self.path = path
+        self.max_attempts = max_attempts
+
+        # A single connection shared by the worker threads, under a lock
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                stage TEXT NOT NULL,
+                rut TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (stage, rut)
+            )
+            """
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (stage, status, attempts)"
+        )
+        self._connection.commit()
+
+
+    def seed(self, stage: str, ruts: list, done: Optional[list] = None) -> None:
+        '''Register the RUTs of the input for a stage. The input is the
+        source of truth: a RUT is done if the input has its results, and a
+        RUT the store has as done goes back to pending (with a clean attempt
+        count) if the input doesn't, e.g. a workbook restored from a backup
+        or with its result columns cleared. New RUTs start as done or
+        pending accordingly.
+
+        With done=None the input doesn't hold the results (they go to
+        another file): new RUTs start as pending and known ones keep their
+        state.'''
+
+        now = time.time()
+        known = done is not None
+        if not known:
+            done = [False] * len(ruts)
+
+        rows = [
+            (stage, rut, self.DONE if is_done else self.PENDING, now)
+            for rut, is_done in zip(ruts, done)
+        ]
+
+        with self._lock:
+            reopened = 0
+            if known:
+                cursor = self._connection.executemany(
+                    "UPDATE jobs SET status = 'pending', attempts = 0, last_error = NULL, updated_at = ? "
+                    "WHERE stage = ? AND rut = ? AND status = 'done'",
+                    [(now, stage, rut) for rut, is_done in zip(ruts, done) if not is_done]
+                )
+                reopened = cursor.rowcount
+
+            self._connection.executemany(
+                "INSERT INTO jobs (stage, rut, status, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (stage, rut) DO UPDATE SET status = excluded.status, "
+                "updated_at = excluded.updated_at "
+                "WHERE excluded.status = 'done' AND jobs.status != 'done'",
+                rows
+            )
+            self._connection.commit()
+
+        if reopened > 0:
+            print(f"Estado {stage}: {reopened} RUTs listos no tienen resultados en el archivo, vuelven a pendientes")
+
+
+    def pending(self, stage: str) -> set:
+        '''Return the RUTs of a stage that still need work: pending, left
+        in flight by an interrupted run, or failed with attempts left'''
+
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT rut FROM jobs WHERE stage = ? AND ("
+                "status IN ('pending', 'in_flight') OR "
+                "(status = 'failed' AND attempts < ?))",
+                (stage, self.max_attempts)
+            ).fetchall()
+
+        return {row[0] for row in rows}
+
+
+    def pending_among(self, stage: str, ruts: list) -> set:
+        '''Same as pending, but only for the given RUTs (e.g. one batch of a
+        streamed file), so the answer stays small'''
+
+        pending = set()
+
+        with self._lock:
+            # Stay below the SQLite limit of parameters per query
+            for start in range(0, len(ruts), 500):
+                chunk = ruts[start:start + 500]
+                placeholders = ", ".join("?" * len(chunk))
+                rows = self._connection.execute(
+                    f"SELECT rut FROM jobs WHERE stage = ? AND rut IN ({placeholders}) AND ("
+                    "status IN ('pending', 'in_flight') OR "
+                    "(status = 'failed' AND attempts < ?))",
+                    (stage, *chunk, self.max_attempts)
+                ).fetchall()
+                pending.update(row[0] for row in rows)
+
+        return pending
+
+
+    def _set(self, stage: str, ruts: list, status: str, error: Optional[str] = None, attempt: bool = False) -> None:
+        now = time.time()
+        increment = 1 if attempt else 0
+
+        with self._lock:
+            self._connection.executemany(
+                "UPDATE jobs SET status = ?, last_error = ?, attempts = attempts + ?, updated_at = ? "
+                "WHERE stage = ? AND rut = ?",
+                [(status, error, increment, now, stage, rut) for rut in ruts]
+            )
+            self._connection.commit()
+
+
+    def mark_in_flight(self, stage: str, ruts: list) -> None:
+        '''The calls for these RUTs are about to be sent'''
+        self._set(stage, ruts, self.IN_FLIGHT)
+
+
+    def mark_done(self, stage: str, rut: str) -> None:
+        self._set(stage, [rut], self.DONE, attempt=True)
+
+
+    def mark_failed(self, stage: str, rut: str, error: str) -> None:
+        self._set(stage, [rut], self.FAILED, error=error, attempt=True)
+
+
+    def reset(self, stage: str, ruts: list) -> None:
+        '''Make these RUTs pending again, with a clean attempt count'''
+
+        now = time.time()
+
+        with self._lock:
+            self._connection.executemany(
+                "UPDATE jobs SET status = 'pending', attempts = 0, last_error = NULL, updated_at = ? "
+                "WHERE stage = ? AND rut = ?",
+                [(now, stage, rut) for rut in ruts]
+            )
+            self._connection.commit()
+
+
+    def counts(self, stage: str) -> dict:
+        '''Return the number of RUTs in each status for a stage'''
+
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT status, COUNT(*) FROM jobs WHERE stage = ? GROUP BY status",
+                (stage,)
+            ).fetchall()
+
+        return dict(rows)
+
+
+    def print_stats(self, stage: str) -> None:
+        '''Print the state of a stage in a single line'''
+
+        counts = self.counts(stage)
+        print(
+            f"Estado {stage}: {counts.get(self.DONE, 0)} listos, "
+            f"{counts.get(self.FAILED, 0)} fallidos, "
+            f"{counts.get(self.PENDING, 0) + counts.get(self.IN_FLIGHT, 0)} pendientes"
+        )
+
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+def build_job_state(excel_file: str) -> JobStateStore:
+    '''Create the job state store of a workbook from the environment.
+
+    JOB_STATE_FILE: SQLite file (default <workbook>.jobs.sqlite)
+    JOB_MAX_ATTEMPTS: failed attempts before a RUT is given up (default 3)'''
+
+    return JobStateStore(
+        path=os.getenv("JOB_STATE_FILE", f"{excel_file}.jobs.sqlite"),
+        max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    )
@@ -73,6 +73,16 @@ class OutputController:
             self._write_to_excel(data)
 
 
+    def write_rows(self, rows: list):
+        """
+        Writes several rows at once (a list of lists) to the CSV output.
+        Cheaper than calling write_output for each row of a big batch.
+        """
+
+        if rows and self.csv_enabled and self.csv_output:
+            pd.DataFrame(rows).to_csv(self.csv_output, mode='a', header=False, index=False)
+
+
     def _write_to_txt(self, data: list):
         '''This method writes data to a TXT file
         The input is a list of string, to be written in one line, separated by two hypens ("--")'''
@@ -6,6 +6,12 @@ import pandas as pd
 
 class PluttoController:
 
+    # Statuses of an entity validation in Plutto. Any other value is
+    # reported and counted as failed, so it can't hold the polling back.
+    RUNNING_STATUSES = {"pending", "processing"}
+    READY_STATUSES = {"completed"}
+    FAILED_STATUSES = {"failed"}
+
     def __init__(self, plutto_client):
         self.plutto_client = plutto_client
         self.output_controller = None
@@ -197,6 +203,67 @@ class PluttoController:
         return found
     
 
+    def provision(self, rut: str) -> tuple[str, str]:
+        '''Make sure a validation exists for the RUT, requesting it if needed.
+
+        Returns the outcome and the validation id:
+        "existente" (already available), "solicitado" (just requested)
+        or "fallido" (could not be requested, id "No").'''
+
+        if not self.plutto_client:
+            self.plutto_client = get_plutto_client()
+
+        found, report = self.plutto_client.obtain_validation_by_tin(rut)
+
+        # Report already available
+        if found:
+            id = report.get('entity_validation', {}).get('id', "No")
+            return "existente", id if id else "No"
+
+        # Report not found (404), request its creation
+        created, id = self.plutto_client.obtain_validation(rut)
+
+        if created and id:
+            return "solicitado", id
+
+        return "fallido", "No"
+
+
+    def validation_status(self, id: str) -> str:
+        '''Check if the report for a validation id is finished.
+
+        Returns "listo", "fallido" or "pendiente". The status is read from
+        the "status" field of the validation; a report without status is
+        considered finished once its last validation is present. An unknown
+        status is printed and returned as "fallido".'''
+
+        if not self.plutto_client:
+            self.plutto_client = get_plutto_client()
+
+        found, report = self.plutto_client.obtain_validation_by_id(id)
+
+        if not found or not report:
+            return "pendiente"
+
+        validation = report.get('entity_validation', report)
+        status = str(validation.get('status') or "").lower()
+
+        if status in self.READY_STATUSES:
+            return "listo"
+
+        if status in self.FAILED_STATUSES:
+            return "fallido"
+
+        if status in self.RUNNING_STATUSES:
+            return "pendiente"
+
+        if not status:
+            return "listo" if validation.get('last_validation') else "pendiente"
+
+        print(f"Estado desconocido '{status}' para el informe {id}. Se considera fallido")
+        return "fallido"
+
+
     def get_output_controller(self) -> None:
         """
         Returns the OutputController instance.
@@ -0,0 +1,186 @@
+import os
+import json
+import shutil
+import tempfile
+from typing import Optional
+import pandas as pd
+
+
+class StatsWriter:
+    '''Buffered writer for the stats output.
+
+    Rows are kept in memory and spilled in batches to a JSON Lines file
+    (one append per batch, types preserved), instead of reopening and
+    re-saving the workbook for every row. On close, the workbook is written
+    once with openpyxl in write-only (streaming) mode, and optionally a
+    Parquet copy for analytics.'''
+
+    def __init__(
+            self,
+            output_file: str,
+            columns: list,
+            flush_rows: int = 5000,
+            parquet_file: Optional[str] = None
+    ):
+        self.output_file = output_file
+        self.columns = columns
+        self.flush_rows = flush_rows
+        self.parquet_file = parquet_file
+        self.spill_file = f"{output_file}.spill.jsonl"
+
+        self.buffer = []
+        self.rows = 0
+
+        # Start from an empty spill
+        if os.path.exists(self.spill_file):
+            os.remove(self.spill_file)
+
+
+    def add(self, row: dict) -> None:
+        '''Add a row (column -> value) to the output'''
+
+        self.buffer.append([row.get(column) for column in self.columns])
+        self.rows += 1
+
+        if len(self.buffer) >= self.flush_rows:
+            self.flush()
+
+
+    def flush(self) -> None:
+        '''Move the buffered rows to the spill file'''
+
+        if not self.buffer:
+            return
+
+        with open(self.spill_file, "a", encoding="utf-8") as spill:
+            spill.writelines(
+                json.dumps(values, ensure_ascii=False, default=str) + "\n"
+                for values in self.buffer
+            )
+
+        self.buffer = []
+
+
+    def _spilled_rows(self):
+        '''Read back every row, in order'''
+
+        if not os.path.exists(self.spill_file):
+            return
+
+        with open(self.spill_file, "r", encoding="utf-8") as spill:
+            for line in spill:
+                yield json.loads(line)
+
+
+    def _write_workbook(self) -> None:
+        '''Write the workbook in a single streaming pass'''
+
+        import openpyxl
+
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet("Sheet1")
+        sheet.append(self.columns)
+
+        for values in self._spilled_rows():
+            sheet.append(values)
+
+        # Write to a temp file first to avoid issues if the original is open
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx") as tmp:
+            temp_path = tmp.name
+        workbook.save(temp_path)
+        shutil.move(temp_path, self.output_file)
+
+
+    def _column_types(self) -> dict:
+        '''Return the Python types found in each column over the whole
+        output (nulls excluded), in one read of the spill file'''
+
+        types = {column: set() for column in self.columns}
+
+        for values in self._spilled_rows():
+            for column, value in zip(self.columns, values):
+                if value is not None:
+                    types[column].add(type(value))
+
+        return types
+
+
+    def _write_parquet(self) -> None:
+        '''Write the Parquet copy, one batch of rows at a time. Numeric
+        columns keep their type; a column that mixes types (e.g. a date or
+        "N/A") is stored as text, with the missing values left as nulls.'''
+
+        import pyarrow
+        import pyarrow.parquet
+
+        def arrow_type(types: set):
+            if types == {bool}:
+                return pyarrow.bool_()
+            if types == {int}:
+                return pyarrow.int64()
+            if types and types <= {int, float}:
+                return pyarrow.float64()
+            return pyarrow.string()
+
+        # The schema is decided over every row, so all the batches share it
+        types = self._column_types()
+        schema = pyarrow.schema([(column, arrow_type(types[column])) for column in self.columns])
+        text_columns = [
+            column for column in self.columns
+            if schema.field(column).type == pyarrow.string() and types[column] - {str}
+        ]
+
+        writer = pyarrow.parquet.ParquetWriter(self.parquet_file, schema)
+        batch = []
+
+        def write_batch():
+            frame = pd.DataFrame(batch, columns=self.columns)
+            for column in text_columns:
+                values = frame[column]
+                frame[column] = values.where(values.isna(), values.astype(str))
+            writer.write_table(pyarrow.Table.from_pandas(frame, schema=schema, preserve_index=False))
+
+        try:
+            for values in self._spilled_rows():
+                batch.append(values)
+                if len(batch) >= self.flush_rows:
+                    write_batch()
+                    batch = []
+
+            if batch:
+                write_batch()
+        finally:
+            writer.close()
+
+
+    def close(self) -> None:
+        '''Write the final outputs and remove the spill file'''
+
+        self.flush()
+
+        self._write_workbook()
+        print(f"Estadísticas guardadas en {self.output_file} ({self.rows} filas)")
+
+        if self.parquet_file:
+            try:
+                self._write_parquet()
+                print(f"Estadísticas guardadas en {self.parquet_file}")
+            except ImportError:
+                print("pyarrow no está instalado. No se generó la salida Parquet")
+
+        if os.path.exists(self.spill_file):
+            os.remove(self.spill_file)
+
+
+def build_stats_writer(output_file: str, columns: list) -> StatsWriter:
+    '''Create the stats writer from the environment.
+
+    STATS_FLUSH_ROWS: rows kept in memory before spilling (default 5000)
+    STATS_PARQUET: also write the stats to this Parquet file (disabled by default)'''
+
+    return StatsWriter(
+        output_file,
+        columns,
+        flush_rows=int(os.getenv("STATS_FLUSH_ROWS", "5000")),
+        parquet_file=os.getenv("STATS_PARQUET") or None
+    )
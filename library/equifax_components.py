@@ -0,0 +1,198 @@
+from dataclasses import dataclass, field
+from typing import Optional, List, Dict, Any, Union
+from direcciones import DireccionPersonaNatural, DireccionPersonaJuridica
+from contact_data import EmailJuridica, PhoneNumberJuridica, PhoneNumberNatural
+from library.json_codec import loads
+
+# ijson is optional: with it the raw reports are parsed incrementally and
+# only the contact sections are ever built in memory
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+
+# Customer kinds, as used by EquifaxClient (token and report of each kind)
+NATURAL = "natural"
+JURIDICA = "juridica"
+
+# Where the contact data lives in each report: field -> path. The natural
+# person email is a single string, everything else is a list of entries.
+CONTACT_PATHS = {
+    NATURAL: {
+        "addresses": ("platinum360", "getInformePlatinum360Response", "response", "Behavior",
+                      "Contactability", "Addresses", "AddressesType"),
+        "phones": ("platinum360", "getInformePlatinum360Response", "response", "Behavior",
+                   "Contactability", "Telephones", "TelephonesType"),
+        "emails": ("platinum360", "getInformePlatinum360Response", "response", "Behavior",
+                   "Other", "Email"),
+    },
+    JURIDICA: {
+        "addresses": ("data", "commercialData", "behavior", "contactability", "contactsDataDetail",
+                      "addresses", "commercialAddresses"),
+        "phones": ("data", "commercialData", "behavior", "contactability", "contactsDataDetail",
+                   "telephones", "referenceData"),
+        "emails": ("data", "commercialData", "behavior", "contactability", "contactsDataDetail",
+                   "emails", "referenceData"),
+    },
+}
+
+# Class of the entries of each field
+CONTACT_CLASSES = {
+    NATURAL: {"addresses": DireccionPersonaNatural, "phones": PhoneNumberNatural, "emails": None},
+    JURIDICA: {"addresses": DireccionPersonaJuridica, "phones": PhoneNumberJuridica, "emails": EmailJuridica},
+}
+
+
+@dataclass
+class ContactData:
+    '''Addresses, phones and emails of a customer, from one Equifax report'''
+    kind: str
+    addresses: List[Union[DireccionPersonaNatural, DireccionPersonaJuridica]] = field(default_factory=list)
+    phones: List[Union[PhoneNumberNatural, PhoneNumberJuridica]] = field(default_factory=list)
+    emails: List[Union[EmailJuridica, str]] = field(default_factory=list)
+
+    def address_strings(self) -> List[str]:
+        return [address_to_string(address) for address in self.addresses]
+
+    def phone_string(self) -> str:
+        '''Phones in the format of the output file'''
+
+        if self.kind == NATURAL:
+            return "".join(f"{phone.telephone}; " for phone in self.phones)
+
+        return "".join(
+            f"{phone.subtype}: +{phone.country_code}-{phone.area_code}-{phone.number}; "
+            for phone in self.phones
+        )
+
+    def email_string(self) -> str:
+        '''The first email (the natural person report has only one)'''
+
+        if not self.emails:
+            return ""
+
+        email = self.emails[0]
+        return email if isinstance(email, str) else f"{email.email}"
+
+
+def address_to_string(direccion) -> str:
+    '''Obtain correctly formatted addresses to include in the output.
+    Works for both classes of customer.'''
+    if isinstance(direccion, DireccionPersonaNatural):
+        return(
+            f"{direccion.street} {direccion.number}, "
+            f"{direccion.communes}, "
+            f"{direccion.city}, "
+            f"{direccion.region}"
+        )
+    elif isinstance(direccion, DireccionPersonaJuridica):
+        return (
+            f"{direccion.addressType} - "
+            f"{direccion.street} {direccion.number}, "
+            f"{direccion.communes}, "
+            f"{direccion.city}, "
+            f"{direccion.region}"
+        )
+
+    else:
+        return "Dirección desconocida"
+
+
+def _compile(paths: Dict[str, tuple]) -> dict:
+    '''Merge the paths of a report into a tree (key -> subtree, or the
+    field name at the end), so shared prefixes are walked only once'''
+
+    tree = {}
+    for name, path in paths.items():
+        node = tree
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        node[path[-1]] = name
+    return tree
+
+
+# Compiled once per kind
+_CONTACT_TREES = {kind: _compile(paths) for kind, paths in CONTACT_PATHS.items()}
+
+
+def _walk(node: Any, tree: dict, found: dict) -> None:
+    '''Collect the values of the tree leaves in a single descent'''
+
+    if not isinstance(node, dict):
+        return
+
+    for key, subtree in tree.items():
+        value = node.get(key)
+        if value is None:
+            continue
+        if isinstance(subtree, dict):
+            _walk(value, subtree, found)
+        else:
+            found[subtree] = value
+
+
+def _build(kind: str, found: dict) -> ContactData:
+    '''Turn the raw sections into the contact objects'''
+
+    classes = CONTACT_CLASSES[kind]
+    contacts = ContactData(kind)
+
+    for name, cls in classes.items():
+        value = found.get(name)
+        if not value:
+            continue
+
+        if cls is None:
+            # Natural person email: a single string
+            setattr(contacts, name, [value] if isinstance(value, str) else [])
+        elif isinstance(value, list):
+            setattr(contacts, name, [cls.from_dict(entry) for entry in value if isinstance(entry, dict)])
+
+    return contacts
+
+
+def extract_contacts(kind: str, report: Dict[str, Any]) -> ContactData:
+    '''Extract the contact data of a decoded report in a single pass over
+    the compiled paths (instead of one walk per field)'''
+
+    found = {}
+    _walk(report, _CONTACT_TREES[kind], found)
+    return _build(kind, found)
+
+
+def extract_contacts_from_bytes(kind: str, content: bytes) -> ContactData:
+    '''Extract the contact data straight from the raw report.
+
+    With ijson, the report is parsed as a stream and only the contact
+    sections are built, so the rest of the (large) document never exists in
+    memory. Without it, the report is decoded and walked as usual.'''
+
+    if ijson is None:
+        return extract_contacts(kind, loads(content))
+
+    # ijson prefixes: keys joined by dots
+    targets = {".".join(path): name for name, path in CONTACT_PATHS[kind].items()}
+
+    found = {}
+    builder = None
+    building = None
+
+    for prefix, event, value in ijson.parse(content, use_float=True):
+        if builder is not None:
+            builder.event(event, value)
+            # The section ends with the closing event at its own prefix
+            if prefix == building and event in ("end_map", "end_array"):
+                found[targets[building]] = builder.value
+                builder = building = None
+            continue
+
+        if prefix in targets:
+            if event in ("start_map", "start_array"):
+                builder = ijson.ObjectBuilder()
+                builder.event(event, value)
+                building = prefix
+            elif event in ("string", "number", "boolean"):
+                found[targets[prefix]] = value
+
+    return _build(kind, found)
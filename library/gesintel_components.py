@@ -1,5 +1,6 @@
-from typing import Optional, List, Union, Dict, Any
-from pydantic import BaseModel, Field
+from typing import Optional, List, Union, Dict, Any, NamedTuple
+from pydantic import BaseModel, Field, TypeAdapter
+from library.json_codec import loads
 
 
 
@@ -115,3 +116,102 @@ class AMLResultResponse(BaseModel):
     status: str
     message: Optional[str]
     results: Optional[Results]
+
+
+# Built once: decodes getAMLResult answers from bytes to the model in one pass
+AML_RESULT_ADAPTER = TypeAdapter(AMLResultResponse)
+
+
+class ScreeningResult(BaseModel):
+    '''Merged answer of several Gesintel endpoints for one RUT'''
+    rut: str
+    found: Dict[str, bool] = Field(default_factory=dict)      # endpoint -> report found
+    reports: Dict[str, Any] = Field(default_factory=dict)     # endpoint -> raw JSON
+    errors: Dict[str, str] = Field(default_factory=dict)      # endpoint -> error message
+
+
+# Result lists of getAMLResult behind each column of the hit vector (the
+# output file columns after the RUT), with the label of the hit and the
+# flag it raises. PEP Candidato reads pepCResults, the same list as PEP, and
+# djResults (column 7) is classified apart. Keep in sync with the output
+# header of GesintelController.
+HIT_RULES = [
+    ("pepCResults", "PEP", "pep"),
+    ("pepHResults", "PEP Histórico", "pep"),
+    ("pepCResults", "PEP Candidato", "pep"),
+    ("fpResults", "fp", "pep"),
+    ("pjudResults", "Poder judicial", "pj"),
+    ("personResults", "PEP", "watchlist"),
+    ("djResults", None, None),
+    ("negativeResults", "Negative", "watchlist"),
+    ("vipResults", "VIP", "pep"),
+    ("pepRelacionados", "PEP Relacionado", "pep"),
+    ("pepHRelacionados", "PEP Histórico Rel", "pep"),
+]
+
+
+class HitSummary(NamedTuple):
+    '''Classification of a getAMLResult response'''
+    hits: List[str]          # "Si"/"No" for each column of the hit vector
+    found_hits: List[str]    # labels of the hits, in column order
+    pep: bool
+    watchlist: bool
+    pj: bool
+
+
+def _classify(results: Any, get) -> HitSummary:
+    '''Apply HIT_RULES. get(results, name) returns a result list (or the
+    djResults dict), from a raw dict or from the model alike.'''
+
+    hits = ["No"] * len(HIT_RULES)
+    found_hits = []
+    flags = {"pep": False, "watchlist": False, "pj": False}
+
+    for column, (name, label, flag) in enumerate(HIT_RULES):
+        value = get(results, name)
+        if not value:
+            continue
+
+        if name == "djResults":
+            # Watchlist (wlResults, ameResults) and state owned companies (socResults, PEP)
+            if value.get("wlResults") or value.get("ameResults"):
+                hits[column] = "Si"
+                found_hits.append("dj")
+                flags["watchlist"] = True
+
+            if value.get("socResults"):
+                hits[column] = "Si"
+                found_hits.append("dj")
+                flags["pep"] = True
+
+            continue
+
+        hits[column] = "Si"
+        found_hits.append(label)
+        flags[flag] = True
+
+    return HitSummary(hits, found_hits, flags["pep"], flags["watchlist"], flags["pj"])
+
+
+def classify_aml_result(data: Union[dict, bytes, str]) -> HitSummary:
+    '''Classify a getAMLResult response straight from the decoded JSON (or
+    its raw bytes). Only the emptiness of each result list is checked, so no
+    model is built for the entries.'''
+
+    if isinstance(data, (bytes, str)):
+        data = loads(data)
+
+    results = data.get("results")
+    if results is None:
+        raise ValueError("La respuesta de getAMLResult no tiene resultados")
+
+    return _classify(results, dict.get)
+
+
+def classify_aml_report(report: AMLResultResponse) -> HitSummary:
+    '''Classify a validated AMLResultResponse (audit path)'''
+
+    if report.results is None:
+        raise ValueError("La respuesta de getAMLResult no tiene resultados")
+
+    return _classify(report.results, getattr)
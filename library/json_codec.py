@@ -0,0 +1,16 @@
+import json
+from typing import Any
+
+# orjson is optional: without it the answers are decoded with the json module
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(content: bytes) -> Any:
+    '''Decode JSON from raw bytes (or text) in a single pass'''
+
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
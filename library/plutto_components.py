@@ -1,15 +1,62 @@
 from dataclasses import dataclass, field, asdict
-from datetime import datetime
+from datetime import datetime, date
 from typing import List, Optional, Any
 import json
-from dateutil.parser import parse
+
+
+def parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    '''Parse a Plutto timestamp. Plutto sends ISO-8601, which
+    datetime.fromisoformat reads directly; anything else goes to dateutil.'''
+
+    if not value:
+        return None
+
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        from dateutil.parser import parse
+        return parse(value)
+
+
+def parse_date(value: Optional[str]) -> Optional[date]:
+    parsed = parse_datetime(value)
+    return parsed.date() if parsed else None
+
+
+class lazy:
+    '''Attribute built from the raw data (instance._data) the first time it
+    is read, and kept in the slot "_<name>" afterwards. The classes below
+    only copy the plain fields on creation; dates and children are parsed
+    when (and if) something reads them.'''
+
+    def __init__(self, build):
+        self.build = build
+
+    def __set_name__(self, owner, name):
+        self.slot = f"_{name}"
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        try:
+            return getattr(instance, self.slot)
+        except AttributeError:
+            value = self.build(instance._data)
+            setattr(instance, self.slot, value)
+            return value
 
 
 class ListMatch:
+    __slots__ = (
+        '_data', 'id', 'hit_id', 'category', 'source', 'listing', 'program',
+        'remarks', 'country', 'position', 'false_positive', 'false_positive_by_id',
+        'type', '_date', '_created_at', '_updated_at'
+    )
+
     def __init__(self, data: dict):
+        self._data = data
         self.id = data.get('id')
         self.hit_id = data.get('hit_id')
-        self.date = parse(data['date']).date() if data.get('date') else None
         self.category = data.get('category')
         self.source = data.get('source')
         self.listing = data.get('listing')
@@ -17,17 +64,25 @@ class ListMatch:
         self.remarks = data.get('remarks')
         self.country = data.get('country')
         self.position = data.get('position')
-        self.created_at = parse(data['created_at']) if data.get('created_at') else None
-        self.updated_at = parse(data['updated_at']) if data.get('updated_at') else None
         self.false_positive = data.get('false_positive', False)
         self.false_positive_by_id = data.get('false_positive_by_id')
         self.type = data.get('type')
 
+    date = lazy(lambda data: parse_date(data.get('date')))
+    created_at = lazy(lambda data: parse_datetime(data.get('created_at')))
+    updated_at = lazy(lambda data: parse_datetime(data.get('updated_at')))
+
     def __repr__(self):
         return f"ListMatch(id={self.id}, category={self.category}, source={self.source})"
 
 class Hit:
+    __slots__ = (
+        '_data', 'id', 'full_name', 'match_types', 'list_types', 'score',
+        'risk_level', 'hit_type', 'countries', '_list_matches'
+    )
+
     def __init__(self, data: dict):
+        self._data = data
         self.id = data.get('id')
         self.full_name = data.get('full_name')
         self.match_types = data.get('match_types', [])
@@ -36,13 +91,22 @@ class Hit:
         self.risk_level = data.get('risk_level')
         self.hit_type = data.get('hit_type')
         self.countries = data.get('countries', [])
-        self.list_matches = [ListMatch(match) for match in data.get('list_matches', [])]
+
+    list_matches = lazy(lambda data: [ListMatch(match) for match in data.get('list_matches', [])])
 
     def __repr__(self):
         return f"Hit(id={self.id}, full_name={self.full_name}, matches={len(self.list_matches)})"
 
 class Watchlist:
+    __slots__ = (
+        '_data', 'id', 'total_hits', 'total_blacklist_hits', 'total_matches',
+        'share_url', 'risk_level', 'watchlistable_name', 'source',
+        'entity_validation_id', 'entity_validation_tin',
+        '_created_at', '_updated_at', '_hits'
+    )
+
     def __init__(self, data: dict):
+        self._data = data
         self.id = data.get('id')
         self.total_hits = data.get('total_hits', 0)
         self.total_blacklist_hits = data.get('total_blacklist_hits', 0)
@@ -51,18 +115,23 @@ class Watchlist:
         self.risk_level = data.get('risk_level')
         self.watchlistable_name = data.get('watchlistable_name')
         self.source = data.get('source')
-        self.created_at = parse(data['created_at']) if data.get('created_at') else None
-        self.updated_at = parse(data['updated_at']) if data.get('updated_at') else None
         self.entity_validation_id = data.get('entity_validation_id')
         self.entity_validation_tin = data.get('entity_validation_tin')
-        self.hits = [Hit(hit) for hit in data.get('hits', [])]
+
+    created_at = lazy(lambda data: parse_datetime(data.get('created_at')))
+    updated_at = lazy(lambda data: parse_datetime(data.get('updated_at')))
+    hits = lazy(lambda data: [Hit(hit) for hit in data.get('hits', [])])
 
     def __repr__(self):
         return f"Watchlist(id={self.id}, name={self.watchlistable_name}, hits={len(self.hits)})"
 
 class WatchlistResponse:
+    __slots__ = ('_data', '_watchlists')
+
     def __init__(self, data: dict):
-        self.watchlists = [Watchlist(wl) for wl in data.get('watchlists', [])]
+        self._data = data
+
+    watchlists = lazy(lambda data: [Watchlist(wl) for wl in data.get('watchlists', [])])
 
     def __repr__(self):
         return f"WatchlistResponse(watchlists={len(self.watchlists)})"
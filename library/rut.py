@@ -0,0 +1,129 @@
+import re
+import numpy as np
+import pandas as pd
+
+
+# Bodies above this number belong to companies (rule of thumb)
+JURIDICA_THRESHOLD = 50000000
+
+# Separators and spaces people write in a RUT: "76.431.161-2", "76431161 - 2"
+_SEPARATORS = r"[.\-\s]"
+
+# A numeric RUT that went through a float: "764311612.0"
+_FLOAT_TEXT = r"^\s*(\d+)\.0\s*$"
+
+
+def check_digit(body: int) -> str:
+    '''Check digit (DV) of a RUT body, by the módulo 11 algorithm'''
+
+    total = 0
+    factor = 2
+    while body > 0:
+        total += (body % 10) * factor
+        body //= 10
+        factor = 2 if factor == 7 else factor + 1
+
+    value = 11 - total % 11
+    if value == 11:
+        return "0"
+    if value == 10:
+        return "K"
+    return str(value)
+
+
+def check_digits(bodies: np.ndarray) -> np.ndarray:
+    '''Vectorized check_digit for an array of RUT bodies'''
+
+    remaining = bodies.astype(np.int64)
+    total = np.zeros_like(remaining)
+    factor = 2
+
+    # A RUT body has at most 9 digits
+    for _ in range(9):
+        total += (remaining % 10) * factor
+        remaining //= 10
+        factor = 2 if factor == 7 else factor + 1
+
+    value = 11 - total % 11
+    return np.where(value == 11, "0", np.where(value == 10, "K", value.astype(str)))
+
+
+def normalize_rut(rut) -> str:
+    '''Canonical key of a RUT: body without leading zeros plus DV, no
+    separators. "76.431.161-2", "76431161-2" and "764311612" give the same
+    key. A value that can't be a RUT is returned cleaned, as is.'''
+
+    if isinstance(rut, float) and rut.is_integer():
+        rut = int(rut)
+
+    text = re.sub(_FLOAT_TEXT, r"\1", str(rut))
+    text = re.sub(_SEPARATORS, "", text).upper()
+
+    if not re.fullmatch(r"\d{1,9}[\dK]", text):
+        return text
+
+    return f"{int(text[:-1])}{text[-1]}"
+
+
+def is_valid_rut(rut) -> bool:
+    '''Check the format and the check digit of a RUT'''
+
+    key = normalize_rut(rut)
+
+    if not re.fullmatch(r"\d{1,9}[\dK]", key) or int(key[:-1]) == 0:
+        return False
+
+    return check_digit(int(key[:-1])) == key[-1]
+
+
+def is_juridica(rut) -> bool:
+    '''Tell if a RUT belongs to a company (persona jurídica)'''
+
+    key = normalize_rut(rut)
+
+    if not re.fullmatch(r"\d{1,9}[\dK]", key):
+        raise ValueError(f"RUT mal formado: {rut}")
+
+    return int(key[:-1]) > JURIDICA_THRESHOLD
+
+
+def normalize_ruts(ruts: pd.Series) -> pd.DataFrame:
+    '''Normalize a whole column of RUTs in one vectorized pass.
+
+    Returns a DataFrame with the same index and the columns:
+    key: canonical key (see normalize_rut)
+    body / dv: numeric body and check digit
+    valid: the format and the check digit are correct
+    juridica: the RUT belongs to a company'''
+
+    # Excel gives numeric RUTs (without hyphen) as floats, also in the
+    # middle of a text column
+    if pd.api.types.is_float_dtype(ruts):
+        ruts = ruts.astype("Int64")
+    elif ruts.dtype == object:
+        ruts = ruts.map(lambda rut: int(rut) if isinstance(rut, float) and rut.is_integer() else rut)
+
+    text = (
+        ruts.astype(str)
+        .str.replace(_FLOAT_TEXT, r"\1", regex=True)
+        .str.replace(_SEPARATORS, "", regex=True)
+        .str.upper()
+    )
+    well_formed = text.str.fullmatch(r"\d{1,9}[\dK]").fillna(False).astype(bool)
+
+    body = pd.to_numeric(text.str[:-1].where(well_formed), errors="coerce").fillna(0).astype("int64")
+    dv = text.str[-1]
+
+    expected = pd.Series(check_digits(body.to_numpy()), index=ruts.index)
+    valid = well_formed & (body > 0) & (dv == expected)
+
+    return pd.DataFrame(
+        {
+            "key": (body.astype(str) + dv).where(well_formed, text),
+            "body": body,
+            "dv": dv,
+            "valid": valid,
+            "juridica": body > JURIDICA_THRESHOLD
+        },
+        index=ruts.index
+    )
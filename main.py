@@ -3,6 +3,8 @@ from clients.equifax_client import get_equifax_client
 from clients.plutto_client import get_plutto_client
 import json
 from preparation import ValidationControlFlow
+from streaming_flow import StreamingValidationFlow
+from clients.payload_archive import get_payload_archive
 from library.plutto_components import WatchlistResponse
 from controllers.plutto_controller import PluttoController
 
@@ -21,6 +23,7 @@ def main():
     # test_plutto_watchlist_response()
 
     # run_gesintel_watchlist_check()
+    # run_contact_enrichment()
 
     # run_stats()
     check_stats_compliance()
@@ -51,6 +54,35 @@ def run_gesintel_watchlist_check():
 
 
 
+def run_gesintel_watchlist_stream():
+    # For files too big to load: read by batches, results go to output_files
+    excel_file = "Datos clientes.xlsx"
+    streaming_flow = StreamingValidationFlow(excel_file)
+
+    streaming_flow.run_gesintel_watchlist_workflow()
+
+
+
+def run_contact_enrichment():
+    # Addresses, phones and emails from Equifax, natural and juridical customers at the same time
+    excel_file = "Datos clientes.xlsx"
+    validation_flow = ValidationControlFlow(excel_file)
+
+    validation_flow.run_contact_enrichment_workflow()
+
+
+
+def replay_gesintel_watchlist_check():
+    # Re-run the hit classification over the archived answers, without calling Gesintel
+    excel_file = "Datos clientes replay.xlsx"
+    validation_flow = ValidationControlFlow(excel_file, replay=True)
+
+    validation_flow.run_gesintel_watchlist_workflow()
+
+    get_payload_archive().print_stats()
+
+
+
 def validation_control_flow():
 
     # Initialize the validation control flow with the Excel file path
@@ -189,14 +221,16 @@ def test_equifax_client():
 def run_stats():
     # excel_file = "Datos clientes.xlsx"
     excel_file = "Ventas.xlsx"
-    validation_flow = ValidationControlFlow(excel_file)
+
+    # The stats only need the RUTs
+    validation_flow = ValidationControlFlow(excel_file, columns=['Rut'])
 
     validation_flow.run_stats()
 
 def check_stats_compliance():
     # excel_file = "Datos clientes.xlsx"
     excel_file = "Ventas.xlsx"
-    validation_flow = ValidationControlFlow(excel_file)
+    validation_flow = ValidationControlFlow(excel_file, columns=['Rut'])
 
     validation_flow.check_completeness()
 
@@ -5,6 +5,9 @@ import json
 from typing import Optional, List, Dict, Any
 from direcciones import DireccionPersonaNatural, DireccionPersonaJuridica
 from contact_data import EmailJuridica, PhoneNumberJuridica, PhoneNumberNatural
+from library.equifax_components import NATURAL, JURIDICA, extract_contacts, address_to_string
+from clients.retry_policy import build_retry_policy
+from library.rut import is_juridica, normalize_rut
 from dotenv import load_dotenv
 import os
 import sys
@@ -13,6 +16,9 @@ import time
 
 load_dotenv()
 
+# Same backoff policy used by the provider clients
+retry_policy = build_retry_policy()
+
 def main():
     # Take a file with this name as a starting point
     # Will output to a different file
@@ -161,29 +167,6 @@ def main():
                 print("No hubo respuesta dentro del tiempo permitido. Continuando por defecto...")
 
 
-def address_to_string(direccion) -> str:
-    '''Obtain correctly formatted addresses to include in the output.
-    Works for both classes of customer.'''
-    if isinstance(direccion, DireccionPersonaNatural):
-        return(
-            f"{direccion.street} {direccion.number}, "
-            f"{direccion.communes}, "
-            f"{direccion.city}, "
-            f"{direccion.region}"
-        )
-    elif isinstance(direccion, DireccionPersonaJuridica):
-        return (
-            f"{direccion.addressType} - "
-            f"{direccion.street} {direccion.number}, "
-            f"{direccion.communes}, "
-            f"{direccion.city}, "
-            f"{direccion.region}"
-        ) 
-            
-    else:
-        return "Dirección desconocida"
-
-
 def obtener_informe_platinum(token: str, rut: str) -> dict:
     '''Obtain report for person'''
 
@@ -359,14 +342,10 @@ def is_persona_juridica(rut: str) -> bool:
     '''Determina si el RUT recibido es de una persona jurídica.
     Si lo es retorna true, de lo contrario false'''
     try:
-        # Get the numeric part before the hyphen
-        numeric_part = rut.split('-')[0]
-        number = int(numeric_part)
-        
-        # Compare to 50000000 (rule of thumb for the type of customer)
-        return number > 50000000
+        # Compare the body to 50000000 (rule of thumb for the type of customer)
+        return is_juridica(rut)
     
-    except (ValueError, AttributeError, IndexError):
+    except ValueError:
         # In case the RUT is malformed or None
         print(f"El valor {rut} no pudo ser procesado. Hubo un error.")
         return False
@@ -375,153 +354,37 @@ def is_persona_juridica(rut: str) -> bool:
 def obtener_direcciones_persona_natural(response: Dict[str, Any]) -> List[DireccionPersonaNatural]:
     '''Retrive list of addresses from report for a person.
     Returns a list of class DireccionPersonaNatural.'''
-
-    try:
-        # Get the addresses from the JSON reponse
-        raw_addresses = (
-                response
-                .get("platinum360", {})
-                .get("getInformePlatinum360Response", {})
-                .get("response", {})
-                .get("Behavior", {})
-                .get("Contactability", {})
-                .get("Addresses", {})
-                .get("AddressesType", [])
-            )
-        
-        # Parse as objects
-        direcciones = [DireccionPersonaNatural.from_dict(addr) for addr in raw_addresses]
-
-        # return list
-        return direcciones
-    
-    except KeyError:
-        # If path doesn't exist, return empty list
-        return[]
+    return extract_contacts(NATURAL, response).addresses
     
 
 def obtener_direcciones_persona_juridica(response: Dict[str, Any]) -> List[DireccionPersonaJuridica]:
     '''Retrive list of addresses from report for a corporation.
     Returns a list of class DireccionPersonaJuridica.'''
-    
-    try:
-        # Get the addresses from the JSON reponse
-        raw_addresses = (
-            response
-                .get("data", {})
-                .get("commercialData",{})
-                .get("behavior",{})
-                .get("contactability", {})
-                .get("contactsDataDetail", {})
-                .get("addresses", {})
-                .get("commercialAddresses", {})
-        )
-
-        # Parse as objects and return the list
-        return [DireccionPersonaJuridica.from_dict(addr) for addr in raw_addresses]
-    
-    except KeyError:
-        # If path doesn't exist, return empty list
-        return[]
+    return extract_contacts(JURIDICA, response).addresses
 
 
 def obtener_telefono_persona_juridica(response: Dict[str, Any]) -> List[PhoneNumberJuridica]:
     '''Retrive list of phone numbers from report for a corporation.
     Returns a list of class PhoneNumberJuridica.'''
-    
-    try:
-        # Get the numbers from the JSON reponse
-        raw_numbers = (
-            response
-            .get("data", {})
-            .get("commercialData",{})
-            .get("behavior",{})
-            .get("contactability", {})
-            .get("contactsDataDetail", {})
-            .get("telephones", {})
-            .get("referenceData", {})
-        )
-
-        # Parse as objects and return the list
-        return [PhoneNumberJuridica.from_dict(num) for num in raw_numbers]
-    
-    except KeyError:
-        # If path doesn't exist, return empty list
-        return []
+    return extract_contacts(JURIDICA, response).phones
 
 
 def obtener_telefono_persona_natural(response: Dict[str, Any]) -> List[PhoneNumberNatural]:
     '''Retrive list of phone numbers from report for a person.
     Returns a list of class PhoneNumberNatural.'''
-    
-    try:
-        # Get the numbers from the JSON reponse
-        raw_numbers = (
-                response
-                .get("platinum360", {})
-                .get("getInformePlatinum360Response", {})
-                .get("response", {})
-                .get("Behavior", {})
-                .get("Contactability", {})
-                .get("Telephones", {})
-                .get("TelephonesType", [])
-            )
-        
-        # Parse as objects and return the list
-        return [PhoneNumberNatural.from_dict(num) for num in raw_numbers]
-
-    except KeyError:
-        # If path doesn't exist, return empty list
-        return []
+    return extract_contacts(NATURAL, response).phones
 
 
 def obtener_email_persona_juridica(response: Dict[str, Any]) -> List[EmailJuridica]:
     '''Retrive list of emails from report for a corporation.
     Returns a list of class EmailJuridica.'''
-    
-    try:
-        # Get the emails from the JSON reponse
-        raw_emails = (
-            response
-            .get("data", {})
-            .get("commercialData",{})
-            .get("behavior",{})
-            .get("contactability", {})
-            .get("contactsDataDetail", {})
-            .get("emails", {})
-            .get("referenceData", {})
-        )
-
-        # Parse as objects and return the list
-        return [EmailJuridica.from_dict(email) for email in raw_emails]
-    
-    except KeyError:
-        # If path doesn't exist, return empty list
-        return []
+    return extract_contacts(JURIDICA, response).emails
 
 
 def obtener_email_personal_natural(response: Dict[str, Any]) -> str:
     '''Retrive list of emails from report for a corporation.
     Returns a string.'''
-    
-    try:
-        # Get the email from the JSON reponse (always one and no more)
-        email = (
-            response
-            .get("platinum360", {})
-            .get("getInformePlatinum360Response", {})
-            .get("response", {})
-            .get("Behavior", {})
-            .get("Other", {})
-            .get("Email", "")
-        )
-
-        # Return as string
-        return email
-    
-    except KeyError:
-        # If path doesn't exist, return empty string
-        return ""
+    return extract_contacts(NATURAL, response).email_string()
    
 
 def procesar_direcciones(
@@ -573,14 +436,11 @@ def procesar_direcciones(
     for idx in range(start, end + 1):
         row = df.iloc[idx]
         rut = row["Rut"]
-        RUT_para_consulta = rut.replace("-", "")
+        RUT_para_consulta = normalize_rut(rut)
         type = row["PERSONA"]
 
-        # Máximum number of retries for the service (in case of an HTTP 500 code)
-        max_retries = 5
-
-        # Time to wait in case a retry is necessary
-        retry_delay = 2
+        # Máximum number of attempts for the service (first call plus retries)
+        max_retries = retry_policy.max_retries + 1
 
         phone_string = ""
         email_string = ""
@@ -594,44 +454,21 @@ def procesar_direcciones(
                     # Obtain the corresponding report
                     response = obtener_informe_platinum(token_natural, RUT_para_consulta)
                     
-                    # Obtain all the addresses in this report
-                    direcciones = obtener_direcciones_persona_natural(response)
-                    # print("Direcciones obtenidas con éxito.")
-                    
-                    # Obtain phone numbers and email
-                    phone_numbers = obtener_telefono_persona_natural(response)
-                    email_string = obtener_email_personal_natural(response)
-
-                    # Prepare phone number string (email is already set as string)
-                    # phone_string = ""
-                    for num in phone_numbers:
-                        phone_string += f"{num.telephone}; "
-                    
-                    # print("Datos de contacto obtenidos con éxito.")
+                    # Obtain addresses, phone numbers and email in a single pass
+                    contacts = extract_contacts(NATURAL, response)
+                    direcciones = contacts.addresses
+                    phone_string = contacts.phone_string()
+                    email_string = contacts.email_string()
                 
                 elif type == "JURIDICA":
                     # Obtain the corresponding report
                     response = obtener_informe_comercial(token_juridico, RUT_para_consulta)
                     
-                    # Obtain all the addresses in this report
-                    direcciones = obtener_direcciones_persona_juridica(response)
-                    # print("Direcciones obtenidas con éxito")
-                    
-                    # Obtain phone numbers and email
-                    phone_numbers = obtener_telefono_persona_juridica(response)
-                    email = obtener_email_persona_juridica(response)
-
-                    # Prepare strings for phone number and email
-                    # phone_string = ""
-                    for num in phone_numbers:
-                        phone_string += f"{num.subtype}: +{num.country_code}-{num.area_code}-{num.number}; "
-
-                    if email:
-                        email_string = f"{email[0].email}"
-                    else:
-                        email_string = ""
-                    
-                    # print("Datos de contacto obtenidos con éxito.")
+                    # Obtain addresses, phone numbers and email in a single pass
+                    contacts = extract_contacts(JURIDICA, response)
+                    direcciones = contacts.addresses
+                    phone_string = contacts.phone_string()
+                    email_string = contacts.email_string()
                 
                 else:
                     direcciones = []
@@ -640,10 +477,12 @@ def procesar_direcciones(
             except requests.exceptions.HTTPError as e:
                 print(f"Ocurrió un error en intento {attempt + 1} de {max_retries} al servicio con rut {rut}: {e}")
                 
-                # If there are available retries, sleep and retry. Otherwise, mark as failed
-                if attempt < max_retries:
-                    time.sleep(retry_delay)
-                else:                    
+                # If there are available retries, back off and retry. Otherwise, mark as failed
+                if attempt < max_retries - 1:
+                    retry_policy.record_retry()
+                    time.sleep(retry_policy.backoff_delay(attempt))
+                else:
+                    retry_policy.record_give_up()
                     df.at[idx, "Procesado"] = 0
                     df.at[idx, "Teléfono"] = ""
                     df.at[idx, "Email"] = ""
@@ -1,26 +1,81 @@
 import pandas as pd
 import os
-import tempfile
-import shutil
 from clients.plutto_client import get_plutto_client
 from clients.gesintel_client import get_gestintel_client
+from clients.equifax_client import get_equifax_client
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from controllers.plutto_controller import PluttoController
 from controllers.gesintel_controller import GesintelController
+from clients.circuit_breaker import CircuitOpenError
+from controllers.checkpoint_journal import build_checkpoint_journal
+from controllers.job_state import JobStateStore, build_job_state
+from clients.payload_archive import set_replay_mode, replay_enabled
+from library.rut import normalize_rut, normalize_ruts
+from library.equifax_components import NATURAL, JURIDICA, ContactData
+from controllers.input_reader import read_table, write_table
+from controllers.stats_writer import build_stats_writer
+from controllers.completeness import (
+    COMPLETENESS_RULES,
+    ALL_RULES,
+    CompletenessTracker,
+    completeness_scope,
+    evaluate_rules,
+    summarize
+)
 
 
 class ValidationControlFlow:
-    def __init__(self, excel_file: str):
+
+    # Result columns recomputed by a replay, per stage
+    REPLAY_COLUMNS = {
+        "plutto_watchlist": ['PEP', 'Watchlist'],
+        "gesintel": ['PEP Ges', 'Watch Ges', 'PJ Ges']
+    }
+
+    # Value of each control column in a row without results. The columns
+    # are created with it, by the workflows and by the journal replay.
+    COLUMN_DEFAULTS = {
+        'Existe informe': "No",
+        'Informe solicitado': "No",
+        'Id': "No",
+        'Estado informe': "S/I",
+        'PEP': "S/I",
+        'Watchlist': "S/I",
+        'PEP Ges': "S/I",
+        'Watch Ges': "S/I",
+        'PJ Ges': "S/I",
+        'Procesado': 0,
+        'Teléfono': "",
+        'Email': ""
+    }
+
+    def __init__(self, excel_file: str, columns: list = None, replay: bool = False):
         """
-        Initializes the class with the given Excel file path.
-        Loads the content into a pandas DataFrame.
+        Initializes the class with the given file path.
+        Loads the content into a pandas DataFrame. Besides Excel, the file
+        can be .csv, .parquet or .feather (detected by extension).
+        With columns, only those columns are loaded; the file can't be saved
+        back then, so use it for workflows that only read it (e.g. run_stats).
+        With replay (or REPLAY_MODE=true), the providers are not called: the
+        answers come from the payload archive, and the watchlist workflows
+        recompute the results of every RUT (work on a copy of the file to
+        keep the previous ones).
         """
         self.filename = excel_file
+        self.columns = columns
+
+        if replay:
+            set_replay_mode(True)
+        self.replay = replay_enabled()
 
         try:
-            self.df = pd.read_excel(excel_file)
+            self.df = read_table(excel_file, columns=columns)
             print(f"Loaded Excel file: {excel_file} with {len(self.df)} rows.")
 
+            # Canonical RUTs, check digits and type of person, in one pass
+            self._normalize_ruts()
+
             # Check if elimination of duplicates is needed
             self._eliminate_duplicates()
 
@@ -28,26 +83,57 @@ class ValidationControlFlow:
             raise FileNotFoundError(f"Excel file '{excel_file}' not found.")
         except Exception as e:
             raise RuntimeError(f"Failed to load Excel file '{excel_file}': {str(e)}")
+
+        # Recover the work done after the last save (e.g. after a crash)
+        self.journal = build_checkpoint_journal(excel_file)
+        recovered = self.journal.replay(self.df, defaults=self.COLUMN_DEFAULTS)
+        if recovered:
+            print(f"Recuperados {recovered} cambios desde el journal {self.journal.path}")
+
+        # Per-RUT state of each stage, to resume a run where it stopped.
+        # A replay is cheap to repeat, so its state is not kept.
+        self.jobs = build_job_state(excel_file) if not self.replay else JobStateStore(":memory:")
         
     
+    def _normalize_ruts(self) -> None:
+        '''
+        Normalizes the RUT column into self.ruts (same index as the file):
+        canonical key, body, check digit, validity and type of person.
+        Invalid RUTs are kept in the file but never sent to the providers.
+        '''
+
+        self.ruts = normalize_ruts(self.df['Rut'])
+
+        invalid = self.df.loc[~self.ruts['valid'], 'Rut']
+        if len(invalid):
+            print(f"RUTs inválidos (no se consultarán): {len(invalid)}")
+            for rut in invalid.head(10):
+                print(f"  {rut}")
+
+
     def _eliminate_duplicates(self) -> None:
         '''
         Eliminates duplicate RUTs from the file.
-        First, it checks if duplicates exist.
+        First, it checks if duplicates exist. RUTs are compared by their
+        canonical key, so "76.431.161-2" and "764311612" are the same customer.
         '''
 
+        duplicated = self.ruts['key'].duplicated(keep="first")
+
         # Check if RUTs are duplicated
-        if self.df['Rut'].duplicated().any():
+        if duplicated.any():
             initial_count = len(self.df)
 
             # Remove duplicates and update
-            self.df = self.df.drop_duplicates(subset=['Rut'], keep="first")
+            self.df = self.df[~duplicated]
+            self.ruts = self.ruts[~duplicated]
             final_count = len(self.df)
             print(f"Removed {initial_count - final_count} duplicated RUTs.")
 
-            # Save to Excel to process this file
-            self.df.to_excel(self.filename, index=False)
-            print(f"Updated file to: {self.filename}")
+            # Save to Excel to process this file (a partial view can't be saved)
+            if self.columns is None:
+                write_table(self.df, self.filename)
+                print(f"Updated file to: {self.filename}")
         
         else:
             print("No duplicates RUTs found.")
@@ -68,53 +154,326 @@ class ValidationControlFlow:
         # Validate the required columns
         self._validate_preparation_columns()
 
-        # Run the preparation process by block of rows, from 0 to the size of the DataFrame
+        # Only the RUTs without a report id need work
+        pending = self._pending_indexes("plutto_prepare")
+        print(f"RUTs pendientes: {len(pending)} de {len(self.df)}")
+
+        # Run the preparation process by block of pending rows
         # Use a set block size to avoid memory issues
         block_size = 100
-        for start in range(0, len(self.df), block_size):
+        for start in range(0, len(pending), block_size):
 
-            end = min(start + block_size, len(self.df))
-            block = self.df.iloc[start:end]
+            end = min(start + block_size, len(pending))
+            block = self.df.loc[pending[start:end]]
 
 
-            print(f"Procesando filas {start} a {end - 1}...") 
+            print(f"Procesando pendientes {start} a {end - 1}...") 
 
             self._prepare_block(block)
 
-            self.save_to_excel()
             # input("Continuar con el siguiente bloque...")
+            # The pace is set by the Plutto rate limiter (PLUTTO_RATE_LIMIT)
 
-            time.sleep(5)
-
-            # input("Presione Enter para continuar con el siguiente bloque...")
+        self._finish_workflow(get_plutto_client(), "Plutto", stage="plutto_prepare")
 
         
-    def _validate_preparation_columns(self) -> None:
+    def prepare_data_bulk(
+            self,
+            max_workers: int = None,
+            poll_timeout: float = None,
+            poll_interval: float = 5,
+            poll_max_interval: float = 60
+    ) -> bool:
+        """
+        Prepares the data like prepare_data, but for the whole file at once.
+        First, the missing validations are requested concurrently. Then all the
+        pending ids are polled together, each one with its own backoff, until
+        the report is finished, has failed or the timeout expires.
+        The outcome is stored in the column 'Estado informe':
+        "Listo", "Fallido" or "Tiempo agotado".
+        """
+        if self.df.empty:
+            print("Archivo vacío. No hay datos para trabajar")
+            return False
 
-        if 'Rut' not in self.df.columns:
-            raise ValueError("La columna 'Rut' no existe en el DataFrame.")
+        # Validate the required columns
+        self._validate_preparation_columns()
+
+        self._add_columns(['Estado informe'])
+
+        if max_workers is None:
+            max_workers = int(os.getenv("PLUTTO_WORKERS", "8"))
+
+        if poll_timeout is None:
+            poll_timeout = float(os.getenv("PLUTTO_POLL_TIMEOUT", "1800"))
+
+        controller = PluttoController(get_plutto_client())
+
+        # Stage 1: request the validations that don't exist yet
+        missing = self._pending_indexes("plutto_prepare")
+
+        while missing:
+            print(f"Solicitando {len(missing)} informes con {max_workers} consultas simultáneas...")
+            parked = []
+            circuit_error = None
+
+            self.jobs.mark_in_flight(
+                "plutto_prepare",
+                [self._rut_key(self.df.at[index, 'Rut']) for index in missing]
+            )
+
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {
+                    executor.submit(controller.provision, str(self.df.at[index, 'Rut'])): index
+                    for index in missing
+                }
+
+                for future in as_completed(futures):
+                    index = futures[future]
+                    rut = self.df.at[index, 'Rut']
+
+                    try:
+                        outcome, id = future.result()
+                    except CircuitOpenError as e:
+                        # Plutto is failing: park the row and try again later
+                        parked.append(index)
+                        circuit_error = e
+                        continue
+                    except Exception as e:
+                        # Keep Id as "No" so the next run tries again
+                        print(f"Error solicitando informe para el RUT {rut}: {e}")
+                        self.df.at[index, 'Estado informe'] = "Fallido"
+                        self._checkpoint(index)
+                        self._finish_job("plutto_prepare", index, str(e))
+                        continue
+
+                    if outcome == "existente":
+                        self.df.at[index, 'Existe informe'] = "Sí"
+                        self.df.at[index, 'Id'] = id
+                        print(f"Informe para el RUT {rut}, con id {id} ya estaba disponible.")
+
+                    elif outcome == "solicitado":
+                        self.df.at[index, 'Informe solicitado'] = "Sí"
+                        self.df.at[index, 'Id'] = id
+                        print(f"Informe solicitado exitosamente para el RUT {rut}, id de comercio: {id}.")
+
+                    else:
+                        self.df.at[index, 'Informe solicitado'] = "No"
+                        self.df.at[index, 'Id'] = "No"
+                        self.df.at[index, 'Estado informe'] = "Fallido"
+                        print(f"No se pudo solicitar el informe para el RUT {rut}.")
+
+                    self._checkpoint(index)
+                    self._finish_job("plutto_prepare", index)
+
+            # Pause the stage until Plutto can be probed again
+            missing = parked
+            if parked:
+                self._wait_for_circuit(circuit_error)
+
+        self.jobs.print_stats("plutto_prepare")
+
+        # Stage 2: wait until the reports are actually finished
+        pending = self.df.index[
+            (self.df['Id'] != "No") &
+            (~self.df['Estado informe'].isin(["Listo", "Fallido"]))
+        ]
+
+        self._poll_validations(
+            controller,
+            list(pending),
+            max_workers,
+            poll_timeout,
+            poll_interval,
+            poll_max_interval
+        )
+
+        self._finish_workflow(get_plutto_client(), "Plutto", stage="plutto_prepare")
+
+        return True
+
+
+    def _poll_validations(
+            self,
+            controller: PluttoController,
+            indexes: list,
+            max_workers: int,
+            timeout: float,
+            interval: float,
+            max_interval: float
+    ) -> None:
+        '''Poll the validation ids of the given rows concurrently until each
+        report is finished or failed. Every id keeps its own backoff, doubling
+        the interval up to max_interval. Rows still pending when the timeout
+        expires are marked "Tiempo agotado".'''
+
+        deadline = time.monotonic() + timeout
+
+        # index -> (next check, current interval)
+        schedule = {index: (time.monotonic(), interval) for index in indexes}
+        print(f"Esperando {len(schedule)} informes pendientes...")
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while schedule:
+                now = time.monotonic()
+
+                # Out of time: whatever is left timed out
+                if now >= deadline:
+                    for index in schedule:
+                        self.df.at[index, 'Estado informe'] = "Tiempo agotado"
+                        self._checkpoint(index)
+                    print(f"Tiempo agotado para {len(schedule)} informes.")
+                    break
+
+                # Only check the ids whose backoff has elapsed
+                due = [index for index, (next_check, _) in schedule.items() if next_check <= now]
+
+                if not due:
+                    next_check = min(next_check for next_check, _ in schedule.values())
+                    time.sleep(max(0.0, min(next_check, deadline) - now))
+                    continue
+
+                futures = {
+                    executor.submit(controller.validation_status, self.df.at[index, 'Id']): index
+                    for index in due
+                }
+
+                for future in as_completed(futures):
+                    index = futures[future]
+
+                    try:
+                        status = future.result()
+                    except Exception as e:
+                        print(f"Error consultando el informe {self.df.at[index, 'Id']}: {e}")
+                        status = "pendiente"
+
+                    if status == "listo":
+                        self.df.at[index, 'Estado informe'] = "Listo"
+                        self._checkpoint(index)
+                        del schedule[index]
+
+                    elif status == "fallido":
+                        self.df.at[index, 'Estado informe'] = "Fallido"
+                        self._checkpoint(index)
+                        del schedule[index]
+
+                    else:
+                        _, current = schedule[index]
+                        schedule[index] = (time.monotonic() + current, min(current * 2, max_interval))
+
+                print(f"Informes pendientes: {len(schedule)}")
+
+
+    @staticmethod
+    def _rut_key(rut) -> str:
+        '''Key of a RUT in the job state store'''
+        return normalize_rut(rut)
 
-        required_columns = ['Existe informe', 'Informe solicitado', "Id"]
 
-        for col in required_columns:
+    def _stage_done(self, stage: str, frame: pd.DataFrame) -> pd.Series:
+        '''Tell, for each row of the frame, if the stage already has its results'''
+
+        if stage == "plutto_prepare":
+            return frame['Id'] != "No"
+
+        if stage == "plutto_watchlist":
+            return (frame['PEP'] != "S/I") & (frame['Watchlist'] != "S/I")
+
+        if stage == "gesintel":
+            return (
+                (frame['PEP Ges'] != "S/I") &
+                (frame['Watch Ges'] != "S/I") &
+                (frame['PJ Ges'] != "S/I")
+            )
+
+        if stage == "equifax_contacts":
+            return pd.to_numeric(frame['Procesado'], errors="coerce").fillna(0) == 1
+
+        raise ValueError(f"Etapa desconocida: {stage}")
+
+
+    def _pending_indexes(self, stage: str) -> list:
+        '''Return the indexes of the rows that still need work in a stage.
+        The RUTs of the file are registered in the job state store first, so
+        a new file (or new rows) join the stage as pending.'''
+
+        # Invalid RUTs never reach the providers
+        valid = self.ruts['valid']
+
+        # A replay recomputes the results of every RUT
+        if self.replay and stage in self.REPLAY_COLUMNS:
+            self.df.loc[valid, self.REPLAY_COLUMNS[stage]] = "S/I"
+
+        keys = self.ruts['key'][valid]
+        self.jobs.seed(stage, keys.tolist(), self._stage_done(stage, self.df[valid]).tolist())
+
+        pending = self.jobs.pending(stage)
+        return list(keys.index[keys.isin(pending)])
+
+
+    def _finish_job(self, stage: str, index, error: str = None) -> None:
+        '''Record the outcome of a row: done if it has its results now,
+        failed otherwise'''
+
+        key = self._rut_key(self.df.at[index, 'Rut'])
+
+        if error is None and self._stage_done(stage, self.df.loc[[index]]).iloc[0]:
+            self.jobs.mark_done(stage, key)
+        else:
+            self.jobs.mark_failed(stage, key, error or "sin resultado")
+
+
+    def _checkpoint(self, index) -> None:
+        '''Record the current values of a row in the journal'''
+
+        values = self.df.loc[index].to_dict()
+        rut = values.pop('Rut')
+        self.journal.record(rut, values)
+
+
+    def _call_with_circuit(self, fn, *args):
+        '''Call a provider method. If the provider circuit is open, pause the
+        stage until it can be probed again and retry the same call, instead
+        of burning through the rest of the input.'''
+
+        while True:
+            try:
+                return fn(*args)
+            except CircuitOpenError as e:
+                self._wait_for_circuit(e)
+
+
+    def _wait_for_circuit(self, error: CircuitOpenError) -> None:
+        '''Sleep until the open circuit lets a probe call through'''
+
+        print(f"{error}. Pausando la etapa...")
+        time.sleep(max(1.0, error.retry_after))
+
+
+    def _add_columns(self, columns: list) -> None:
+        '''Create the missing control columns, with the value of a row
+        without results'''
+
+        for col in columns:
             if col not in self.df.columns:
-                self.df[col] = "No"
+                self.df[col] = self.COLUMN_DEFAULTS[col]
                 print("Columna agregada:", col)
 
+
+    def _validate_preparation_columns(self) -> None:
+
+        if 'Rut' not in self.df.columns:
+            raise ValueError("La columna 'Rut' no existe en el DataFrame.")
+
+        self._add_columns(['Existe informe', 'Informe solicitado', "Id"])
+
     
     def _validate_watchlist_columns(self) -> None:
         '''This method checks if the control columns needed for Plutto validations
         are part of the original Excel file. If they don't exist, the method
         creates them with a default value for each row'''
         
-        # List the required columns
-        required_columns = ['PEP', 'Watchlist']
-
-        # For each required column, if they don't exist, create them
-        for col in required_columns:
-            if col not in self.df.columns:
-                self.df[col] = "S/I"
-                print("Columna agregada:", col)
+        self._add_columns(['PEP', 'Watchlist'])
 
 
     def _validate_gestintel_watchlist_columns(self) -> None:
@@ -122,14 +481,39 @@ class ValidationControlFlow:
         are part of the original Excel file. If they don't exist, the method
         creates them with a default value for each row'''
 
-        # List the required columns
-        required_columns = ['PEP Ges', 'Watch Ges', "PJ Ges"]
+        self._add_columns(['PEP Ges', 'Watch Ges', "PJ Ges"])
 
-        # For each required column, if they don't exist, create them
-        for col in required_columns:
-            if col not in self.df.columns:
-                self.df[col] = "S/I"
-                print("Columna agregada:", col)
+
+    def _validate_contact_columns(self) -> None:
+        '''This method checks if the columns of the contact enrichment exist,
+        and creates the missing ones: type of person, processed flag, phone
+        and email. The address columns (direccion1, direccion2, ...) are
+        added as the reports bring them.'''
+
+        persona = self.ruts['juridica'].map({True: "JURIDICA", False: "NATURAL"})
+
+        if 'PERSONA' not in self.df.columns:
+            self.df['PERSONA'] = persona
+            print("Columna agregada: PERSONA")
+        else:
+            # A journal replay leaves it empty in the rows it didn't touch
+            self.df['PERSONA'] = self.df['PERSONA'].fillna(persona)
+
+        self._add_columns(["Procesado", "Teléfono", "Email"])
+
+
+    def _apply_contacts(self, index, contacts: ContactData) -> None:
+        '''Write the contact data of a customer in its row'''
+
+        for number, address in enumerate(contacts.address_strings(), start=1):
+            column = f"direccion{number}"
+            if column not in self.df.columns:
+                self.df[column] = ""
+            self.df.at[index, column] = address
+
+        self.df.at[index, "Teléfono"] = contacts.phone_string() or "S/I"
+        self.df.at[index, "Email"] = contacts.email_string() or "S/I"
+        self.df.at[index, "Procesado"] = 1
 
 
     def _prepare_block(self, block: pd.DataFrame) -> None:
@@ -147,38 +531,48 @@ class ValidationControlFlow:
             # Check if the report already existed, or if it has been requested.
             # Only use the services if it hasn't been requested yet.
             if row['Id'] == "No":
+                self.jobs.mark_in_flight("plutto_prepare", [self._rut_key(rut)])
 
-                # Here you would call the Plutto client to get the report
-                found, report = plutto_client.obtain_validation_by_tin(rut)
+                try:
+                    # Here you would call the Plutto client to get the report
+                    found, report = self._call_with_circuit(plutto_client.obtain_validation_by_tin, rut)
                 
-                # If report was found
-                if found:
-                    self.df.at[index, 'Existe informe'] = "Sí"
-                    id = report.get('entity_validation', {}).get('id', "No")
-                    self.df.at[index, 'Id'] = id if id else "No"
-                    print(f"Informe para el RUT {rut}, con id {id} ya estaba disponible.")
-
-                # Else (report not found, 404, must create it)
-                else:
-                    print(f"Informe no exitía. Solicitando informe para el RUT {rut}")
+                    # If report was found
+                    if found:
+                        self.df.at[index, 'Existe informe'] = "Sí"
+                        id = report.get('entity_validation', {}).get('id', "No")
+                        self.df.at[index, 'Id'] = id if id else "No"
+                        print(f"Informe para el RUT {rut}, con id {id} ya estaba disponible.")
+
+                    # Else (report not found, 404, must create it)
+                    else:
+                        print(f"Informe no exitía. Solicitando informe para el RUT {rut}")
                     
-                    # Create report
-                    created, id = plutto_client.obtain_validation(rut)
+                        # Create report
+                        created, id = self._call_with_circuit(plutto_client.obtain_validation, rut)
                     
-                    # If creation worked
-                    if created:
-                        # Report requestes (not existing)
-                        self.df.at[index, 'Informe solicitado'] = "Sí"
-                        # Report will be available
-                        self.df.at[index, 'Id'] = id if id else "No"
-                        print(f"Informe solicitado exitosamente, id de comercio: {id}.")
+                        # If creation worked
+                        if created:
+                            # Report requestes (not existing)
+                            self.df.at[index, 'Informe solicitado'] = "Sí"
+                            # Report will be available
+                            self.df.at[index, 'Id'] = id if id else "No"
+                            print(f"Informe solicitado exitosamente, id de comercio: {id}.")
                     
-                    # If it didn't work
-                    else:
-                        # Report not requested (request failed) and hence not available
-                        self.df.at[index, 'Informe solicitado'] = "No"
-                        self.df.at[index, 'Id'] = "No"
-                        print("No se pudo solicitar el informe.")
+                        # If it didn't work
+                        else:
+                            # Report not requested (request failed) and hence not available
+                            self.df.at[index, 'Informe solicitado'] = "No"
+                            self.df.at[index, 'Id'] = "No"
+                            print("No se pudo solicitar el informe.")
+
+                except Exception as e:
+                    print(f"Error preparando el RUT {rut}: {e}")
+                    self._finish_job("plutto_prepare", index, str(e))
+                    continue
+
+                self._checkpoint(index)
+                self._finish_job("plutto_prepare", index)
 
             else:  
                 print(f"El informe para el RUT {rut} ya estaba disponible.")
@@ -208,35 +602,61 @@ class ValidationControlFlow:
             "Fuente"
         ]
 
-        pd.DataFrame(columns=EXCEL_COLUMNS).to_excel(
-            self.output_file,
-            index=False,
-            engine='openpyxl')
+        # Rows are buffered and the workbook is written once, at the end
+        self.stats_writer = build_stats_writer(self.output_file, EXCEL_COLUMNS)
+
+        # Live completeness, readable while the run goes on (STATS_STATUS_FILE)
+        self.completeness = CompletenessTracker(
+            status_file=os.getenv("STATS_STATUS_FILE", "plutto_stats_status.json")
+        )
         
         block_size = 10
         
-        for start in range(0, len(self.df), block_size):
-            end = min(start + block_size, len(self.df))
-            block = self.df.iloc[start:end]
+        # Invalid RUTs never reach the providers
+        valid_rows = self.df[self.ruts['valid']]
 
-            print(f"Procesando filas {start} a {end - 1}...") 
+        try:
+            for start in range(0, len(valid_rows), block_size):
+                end = min(start + block_size, len(valid_rows))
+                block = valid_rows.iloc[start:end]
 
-            self._obtain_stats_block(block)
+                print(f"Procesando filas {start} a {end - 1}...") 
+
+                self._obtain_stats_block(block)
+                self.completeness.print_summary()
+
+                # input("Continuar con el siguiente bloque...")
+                # The pace is set by the Plutto rate limiter (PLUTTO_RATE_LIMIT)
+
+        finally:
+            # Also on an error: the rows obtained so far reach the workbook
+            self.stats_writer.close()
+
+        self._finish_workflow(get_plutto_client(), "Plutto", save=False)
 
-            # input("Continuar con el siguiente bloque...")
 
-            time.sleep(1)
+    def completeness_status(self) -> dict:
+        '''
+        Live completeness of the current (or last) run_stats: rows in scope,
+        rate of each rule and the same per Fuente. No need to read the output.
+        '''
+        if getattr(self, "completeness", None) is None:
+            return {}
+
+        return self.completeness.snapshot()
 
 
     def check_completeness(self) -> None:
         '''
-        Check if the data is present
+        Check if the data is present.
+        The rules are declared in controllers/completeness.py; the summary
+        has one sheet overall and one per breakdown column.
         '''
 
         self.output_file = "plutto_stats_output.xlsx"
 
         try:
-            df = pd.read_excel(self.output_file)
+            df = read_table(self.output_file)
         except FileNotFoundError:
             raise RuntimeError(
                 f"Output file not found: {self.output_path}. "
@@ -244,110 +664,41 @@ class ValidationControlFlow:
             )
         
         
-        df_valid = df[df["RUT"].notna()]
-
         # Filter to only consider the required IDs.
-        df_valid = df_valid[df_valid["Fuente"] != "Persona natural"]
-        # df_valid = df_valid[df_valid["Fuente"] != "Registro Electrónico"]
-
+        df_valid = completeness_scope(df)
         total_rows = len(df_valid)
 
-        # Rule 1: at least 1 activity
-        rule_activities = df_valid['Actividades'].fillna(0) >= 1
-        success_rate_activities = round(
-            (rule_activities.sum() / total_rows) * 100 , 2)
+        # Every rule of the registry, in one vectorized pass
+        matrix = evaluate_rules(df_valid)
+        sheets = summarize(df_valid, matrix)
+
+        print(f"\n\nTotal de filas: {total_rows}")
 
-        # Rule 2: País cannot be null or N/A
-        rule_country  = df_valid['País'].notna() & (df_valid['País'] != "N/A")
-        success_rate_country = round(
-            (rule_country.sum() / total_rows) * 100 , 2)
+        descriptions = {rule.name: rule.description for rule in COMPLETENESS_RULES}
+        descriptions[ALL_RULES] = "que cumplen todas las reglas"
 
-        # Rule 3: Tipo_compañia cannot be null or N/A
-        rule_type = df_valid['Tipo_compañia'].notna() & (df_valid['Tipo_compañia'] != "N/A")
-        success_rate_company_type = round(
-            (rule_type.sum() / total_rows) * 100 , 2)
-        
-        # Rule 4: Fecha_constitución cannot be null or N/A
-        rule_formation_date = df_valid['Fecha_constitución'].notna() & (df_valid['Fecha_constitución'] != "N/A")
-        success_rate_date = round(
-            (rule_formation_date.sum() / total_rows) * 100 , 2)
-        
-        # Rule 5: Managers must be at least 1
-        rule_managers = df_valid['Gerentes'].fillna(0) >= 1
-        success_rate_managers = round(
-            (rule_managers.sum() / total_rows) * 100 , 2)
-
-        # Rule 6: Representatives must be at least 1
-        rule_representatives = df_valid['Representantes'].fillna(0) >= 1
-        success_rate_representatives = round(
-            (rule_representatives.sum() / total_rows) * 100 , 2)
-
-        # Rule 7: Shareholders must be at least 1
-        rule_shareholders = df_valid['Accionistas'].fillna(0) >= 1
-        success_rate_shareholders = round(
-            (rule_shareholders.sum() / total_rows) * 100 , 2)
-
-        # Rule 8: Total participation must be exactly 100%
-        rule_participation = df_valid['Total_participación'].fillna(0) == 100.0
-        success_rate_participation = round(
-            (rule_participation.sum() / total_rows) * 100 , 2)
-
-        # Check percentage of cases belonging to electronic registry
-        rule_registry = df_valid["Fuente"] == "Registro Electrónico"
-        percentage_electronic_registry = round(
-            (rule_registry.sum() / total_rows) * 100, 2) 
-        
-        # All rules combined
-        all_rules = (
-            rule_activities &
-            rule_country &
-            rule_type &
-            rule_formation_date &
-            rule_managers &
-            rule_representatives &
-            rule_shareholders &
-            rule_participation
-            )
-        
-        overall_success_rate = round(
-            (all_rules.sum() / total_rows) * 100 , 2)
+        for _, summary_row in sheets["Resumen"].iterrows():
+            description = descriptions[summary_row["Regla"]]
+            print(f"Porcentaje de filas {description}: {summary_row['Porcentaje']}%")
 
-        print(f"\n\nTotal de filas: {total_rows}")
-        print(f"Porcentaje de filas con al menos 1 actividad: {success_rate_activities}%")
-        print(f"Porcentaje de filas con país válido: {success_rate_country}%")
-        print(f"Porcentaje de filas con tipo de compañía válido: {success_rate_company_type}%")
-        print(f"Porcentaje de filas con fecha de constitución válida: {success_rate_date}%")
-        print(f"Porcentaje de filas con al menos 1 gerente: {success_rate_managers}%")
-        print(f"Porcentaje de filas con al menos 1 representante: {success_rate_representatives}%")
-        print(f"Porcentaje de filas con al menos 1 accionista: {success_rate_shareholders}%")
-        print(f"Porcentaje de filas con participación total del 100%: {success_rate_participation}%")
-        print(f"Porcentaje de filas que cumplen todas las reglas: {overall_success_rate}%")
-        print(f"Porcentaje de filas declaradas en registro electrónico: {percentage_electronic_registry}")
-
-        summary_df = pd.DataFrame([
-            {"Regla": "Al menos 1 actividad", "Porcentaje": success_rate_activities},
-            {"Regla": "País válido", "Porcentaje": success_rate_country},
-            {"Regla": "Tipo de compañía válido", "Porcentaje": success_rate_company_type},
-            {"Regla": "Fecha de constitución válida", "Porcentaje": success_rate_date},
-            {"Regla": "Al menos 1 gerente", "Porcentaje": success_rate_managers},
-            {"Regla": "Al menos 1 representante", "Porcentaje": success_rate_representatives},
-            {"Regla": "Al menos 1 accionista", "Porcentaje": success_rate_shareholders},
-            {"Regla": "Participación total = 100%", "Porcentaje": success_rate_participation},
-            {"Regla": "TODAS las reglas", "Porcentaje": overall_success_rate},
-            {"Regla": "Datos obtenidos de registro electrónico", "Porcentaje": percentage_electronic_registry}
-        ])
+        for sheet_name, summary_df in sheets.items():
+            if sheet_name != "Resumen":
+                print(f"\n{sheet_name}:")
+                print(summary_df.to_string(index=False))
 
+        # All the summary sheets in a single write of the workbook
         with pd.ExcelWriter(
             self.output_file,
             engine='openpyxl',
             mode='a',
             if_sheet_exists='replace'
             ) as writer:
-            summary_df.to_excel(
-                writer,
-                index=False,
-                sheet_name='Resumen'
-            )
+            for sheet_name, summary_df in sheets.items():
+                summary_df.to_excel(
+                    writer,
+                    index=False,
+                    sheet_name=sheet_name
+                )
 
     
 
@@ -360,30 +711,6 @@ class ValidationControlFlow:
         # # else:
 
     
-    def _append_stats_to_output(self, row: dict) -> None:
-        '''
-        Appends a single row of stats to the output Excel file.
-        '''
-        df_row = pd.DataFrame([row])
-
-        with pd.ExcelWriter(
-            self.output_file,
-            engine='openpyxl',
-            mode='a',
-            if_sheet_exists='overlay'
-            ) as writer:
-            sheet = writer.sheets['Sheet1']
-            startrow = sheet.max_row
-
-            df_row.to_excel(
-                writer,
-                index=False,
-                header=False,
-                startrow=startrow
-            )
-
-
-
     def _obtain_stats_block(self, block: pd.DataFrame) -> None:
         '''
         Get Plutto report to compile stats about the commerce.
@@ -391,13 +718,16 @@ class ValidationControlFlow:
 
         plutto_client = get_plutto_client()
 
+        # Rows of the block, for the completeness counters
+        stats_rows = []
+
         # Take each row from the block
         for index, row in block.iterrows():
             rut = row['Rut']
             print(f"Procesando RUT: {rut} en índice {index}")
 
             # Here you would call the Plutto client to get the report
-            found, report = plutto_client.obtain_validation_by_tin(rut)
+            found, report = self._call_with_circuit(plutto_client.obtain_validation_by_tin, rut)
             
             # If report was found
             if found:
@@ -489,13 +819,17 @@ class ValidationControlFlow:
                         "Fuente": source
                     }
 
-                    self._append_stats_to_output(stats_row)
+                    self.stats_writer.add(stats_row)
+                    stats_rows.append(stats_row)
 
 
             # Else (report not found, 404, must create it)
             else:
                 pass
 
+        # One update (and one write of the status file) per block
+        self.completeness.update(stats_rows)
+
 
 
 
@@ -514,21 +848,39 @@ class ValidationControlFlow:
 
     def save_to_excel(self) -> None:
         """
-        Saves the current DataFrame back to the original Excel file path.
-        If the file is open or locked, it writes to a temp file and replaces it.
+        Saves the current DataFrame back to the original file path, in its
+        format. If the file is open or locked, it writes to a temp file and
+        replaces it.
+        The workflows call it only at the end (the journal keeps the progress
+        in between), but it can be called at any time to materialize the file.
         """
-        try:
-            # Write to a temp file first to avoid issues if the original is open
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx") as tmp:
-                temp_path = tmp.name
-                self.df.to_excel(temp_path, index=False, engine='openpyxl')
+        if self.columns is not None:
+            raise RuntimeError(f"Only some columns of '{self.filename}' were loaded, it can't be saved")
 
-            # Overwrite the original file
-            shutil.move(temp_path, self.filename)
+        try:
+            # Writes to a temp file first to avoid issues if the original is open
+            write_table(self.df, self.filename)
             print(f"Saved DataFrame to {self.filename}")
         except Exception as e:
             raise RuntimeError(f"Failed to save Excel file '{self.filename}': {str(e)}")
 
+        # The workbook has every change now
+        self.journal.clear()
+
+
+    def _finish_workflow(self, client, name: str, stage: str = None, save: bool = True) -> None:
+        '''Common end of the workflows. The rows are in the journal already,
+        so the workbook is written once, here; then the state of the stage
+        and how well the connections of the provider were reused are printed.'''
+
+        if save:
+            self.save_to_excel()
+
+        if stage is not None:
+            self.jobs.print_stats(stage)
+
+        client.transport.print_stats(name)
+
 
     def run_watchilist_workflow(self) -> bool:
         """
@@ -543,32 +895,49 @@ class ValidationControlFlow:
 
         self._validate_watchlist_columns()
 
+        # Only the RUTs without watchlist results need work
+        pending = self._pending_indexes("plutto_watchlist")
+        print(f"RUTs pendientes: {len(pending)} de {len(self.df)}")
+
         # Process by block
         block_size = 50
         
-        for start in range(0, len(self.df), block_size):
-            end = min(start + block_size, len(self.df))
-            block = self.df.iloc[start:end]
+        for start in range(0, len(pending), block_size):
+            end = min(start + block_size, len(pending))
+            block = self.df.loc[pending[start:end]]
 
-            print(f"Procesando filas {start} a {end - 1}...") 
+            print(f"Procesando pendientes {start} a {end - 1}...") 
 
             # Iterate through each row in the block
             for index, row in block.iterrows():
                 id = row['Id']
+
+                # Skip reports that were requested but are not finished
+                if row.get('Estado informe', "Listo") in ("Fallido", "Tiempo agotado"):
+                    print(f"El informe con ID {id} no está listo. Lo omitiremos")
+                    continue
+
+                # Without a report id there is nothing to check yet
+                if id == "No":
+                    print(f"El RUT {row['Rut']} no tiene ID. Lo omitiremos")
+                    continue
+
                 print(f"Revisando watchlists para el ID: {id}")
+                self.jobs.mark_in_flight("plutto_watchlist", [self._rut_key(row['Rut'])])
 
                 # Call the controller to check watchlists
-                updated_row = controller.check_watchlists(row, index)
+                updated_row = self._call_with_circuit(controller.check_watchlists, row, index)
 
                 if updated_row is not None:
                     self.df.loc[index] = updated_row
+                    self._checkpoint(index)
+
+                self._finish_job("plutto_watchlist", index)
 
                 # time.sleep(3)
                 # input("\n\nContinuar con el siguiente ID...")
 
-            # Save the DataFrame block back to the Excel file
-            self.save_to_excel()
-            time.sleep(5)
+        self._finish_workflow(plutto_client, "Plutto", stage="plutto_watchlist")
         
         # # Iterate through each row in the DataFrame, by blocks
         # for index, row in self.df.iterrows():
@@ -581,9 +950,22 @@ class ValidationControlFlow:
         #     input("\n\nContinuar con el siguiente ID...")
 
     
-    def run_gesintel_watchlist_workflow(self, block_size: int = 10):
+    def run_gesintel_watchlist_workflow(
+            self,
+            block_size: int = 5,
+            max_workers: int = None,
+            force_refresh: list = None
+    ):
         '''
         Run a validation workflow for Gesintel.
+
+        With max_workers > 1 (or GESINTEL_WORKERS in the environment) the
+        getAMLResult calls of each block run concurrently, keeping up to
+        max_workers calls in flight. The default (1) keeps the sequential run.
+
+        The RUTs in force_refresh skip the response cache and are validated
+        again, even if they already have results. They can be written in any
+        format.
         '''
         
         # Get the client
@@ -595,38 +977,195 @@ class ValidationControlFlow:
         # Validate if the control columns exist
         self._validate_gestintel_watchlist_columns()
 
-        # Get the size of the DataFrame
-        total_rows = len(self.df)
+        # Drop the cached answers and the results of the RUTs to refresh
+        if force_refresh:
+            if gesintel_client.response_cache is not None:
+                gesintel_client.response_cache.invalidate(force_refresh)
+
+            refresh_keys = [normalize_rut(rut) for rut in force_refresh]
+            refresh_rows = self.ruts['key'].isin(refresh_keys)
+            self.df.loc[refresh_rows, ['PEP Ges', 'Watch Ges', 'PJ Ges']] = "S/I"
+            print(f"RUTs a refrescar: {refresh_rows.sum()}")
+
+            for index in self.df.index[refresh_rows]:
+                self._checkpoint(index)
+
+            self.jobs.reset("gesintel", refresh_keys)
+
+        # Determine the number of concurrent calls
+        if max_workers is None:
+            max_workers = int(os.getenv("GESINTEL_WORKERS", "1"))
+        concurrent = max_workers > 1
+
+        # Only the RUTs without Gesintel results need work
+        pending = self._pending_indexes("gesintel")
+        total_rows = len(pending)
+        print(f"RUTs pendientes: {total_rows} de {len(self.df)}")
 
         # Starting point for the frame
         initial_position = 0
 
-        # Process by block
-        block_size = 5
+        # In concurrent mode, make the blocks big enough to keep the workers busy
+        if concurrent:
+            block_size = max(block_size, max_workers * 10)
+            print(f"Modo concurrente: {max_workers} consultas simultáneas, bloques de {block_size}")
+
+        # Keep track of the throughput
+        processed = 0
+        start_time = time.perf_counter()
 
         # Move through the DataFrame (file) block by block according to definitions
         for start in range(initial_position, total_rows, block_size):
             end = min(start + block_size, total_rows)
-            block = self.df.iloc[start:end]
+            block_indexes = pending[start:end]
+            block = self.df.loc[block_indexes]
 
-            print(f"Procesando filas {start} to {end - 1}")
+            print(f"Procesando pendientes {start} to {end - 1}")
 
-            # Within the block, extract the row and the index for each case
-            for index, row in block.iterrows():
-                rut = row['Rut']
-                # print(f"Vamos a procesar comercio {rut}...")
-                
-                # Call the validation method. This returns a modified row if there are
-                # changes, or nothing if not
-                updated_row = controller.check_watchlists(row, index)
+            self.jobs.mark_in_flight("gesintel", [self._rut_key(rut) for rut in block['Rut']])
 
-                # If the new row is not empty (that is, if it changed), replace it
-                if updated_row is not None:
-                    self.df.loc[index] = updated_row
+            if concurrent:
+                while True:
+                    # The controller returns only the rows that changed
+                    for index, updated_row in controller.check_watchlists_concurrently(block, max_workers):
+                        self.df.loc[index] = updated_row
+                        self._checkpoint(index)
+                        processed += 1
+
+                    if controller.circuit_error is None:
+                        break
+
+                    # Gesintel is failing: pause and retry the parked rows of the block
+                    self._wait_for_circuit(controller.circuit_error)
+                    block = self.df.loc[block_indexes]
+
+            else:
+                # Within the block, extract the row and the index for each case
+                for index, row in block.iterrows():
+                    
+                    # Call the validation method. This returns a modified row if there are
+                    # changes, or nothing if not
+                    updated_row = self._call_with_circuit(controller.check_watchlists, row, index)
+
+                    # If the new row is not empty (that is, if it changed), replace it
+                    if updated_row is not None:
+                        self.df.loc[index] = updated_row
+                        self._checkpoint(index)
+                        processed += 1
+
+            for index in block_indexes:
+                self._finish_job("gesintel", index)
 
             # input("Continuar...")
-            self.save_to_excel()
-            print("Esperando 2 segundos (para no superar el límite de consultas)...")
-            time.sleep(2)
+            # The pace is set by the Gesintel rate limiter (GESINTEL_RATE_LIMIT)
+
+        # Report the achieved throughput
+        elapsed = time.perf_counter() - start_time
+        rate = processed / elapsed if elapsed > 0 else 0.0
+        print(f"RUTs procesados: {processed} en {elapsed:.1f} s ({rate:.2f} RUTs/s)")
+
+        self._finish_workflow(gesintel_client, "Gesintel", stage="gesintel")
+
+        if gesintel_client.response_cache is not None:
+            gesintel_client.response_cache.print_stats("Gesintel")
+
 
+    def run_contact_enrichment_workflow(self, max_workers: int = None) -> None:
+        '''
+        Enrich the customers with their addresses, phones and emails from
+        Equifax: the Platinum360 report for natural persons and the
+        empresarial report for corporations.
+
+        Each kind of customer runs in its own queue, with its own token and
+        rate limit (EQUIFAX_NATURAL_RATE_LIMIT, EQUIFAX_JURIDICA_RATE_LIMIT),
+        and up to max_workers calls in flight per queue (EQUIFAX_WORKERS,
+        default 2). Both queues run at the same time.
+
+        The results go to the Procesado, Teléfono, Email and direccion<n>
+        columns through the journal and the job state store, so a stopped run
+        resumes with the customers still pending. The file is written once,
+        at the end. The token origin is read from EQUIFAX_TOKEN_ORIGIN
+        ("env" by default, or "auth").
+        '''
+
+        stage = "equifax_contacts"
+
+        # Get the client, with its tokens (a replay needs none)
+        equifax_client = get_equifax_client()
+        if not self.replay:
+            equifax_client.set_token_origin(os.getenv("EQUIFAX_TOKEN_ORIGIN", "env"))
+
+        if max_workers is None:
+            max_workers = int(os.getenv("EQUIFAX_WORKERS", "2"))
+
+        self._validate_contact_columns()
 
+        # Only the customers without contact data need work, split by kind
+        pending = self._pending_indexes(stage)
+        juridica = self.ruts['juridica']
+        queues = {
+            NATURAL: [index for index in pending if not juridica.at[index]],
+            JURIDICA: [index for index in pending if juridica.at[index]]
+        }
+        print(
+            f"RUTs pendientes: {len(pending)} de {len(self.df)} "
+            f"({len(queues[NATURAL])} personas naturales, {len(queues[JURIDICA])} jurídicas)"
+        )
+
+        self.jobs.mark_in_flight(stage, self.ruts['key'][pending].tolist())
+
+        # Keep track of the throughput of each queue
+        processed = {NATURAL: 0, JURIDICA: 0}
+        start_time = time.perf_counter()
+
+        # One pool per queue, so a slow kind doesn't hold the other one back
+        executors = {
+            kind: ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"equifax_{kind}")
+            for kind in queues
+        }
+
+        try:
+            futures = {}
+            for kind, indexes in queues.items():
+                for index in indexes:
+                    future = executors[kind].submit(
+                        self._call_with_circuit,
+                        equifax_client.obtain_contacts,
+                        kind,
+                        self.ruts.at[index, 'key']
+                    )
+                    futures[future] = (kind, index)
+
+            # The rows are updated here only, as the reports arrive
+            for future in as_completed(futures):
+                kind, index = futures[future]
+                rut = self.df.at[index, 'Rut']
+
+                try:
+                    contacts = future.result()
+                except Exception as e:
+                    print(f"Error al procesar cliente {rut}: {e}")
+                    self._finish_job(stage, index, error=str(e))
+                    continue
+
+                self._apply_contacts(index, contacts)
+                self._checkpoint(index)
+                self._finish_job(stage, index)
+                processed[kind] += 1
+
+                print(
+                    f"Cliente {rut} ({kind}): {len(contacts.addresses)} direcciones, "
+                    f"{len(contacts.phones)} teléfonos, {len(contacts.emails)} emails"
+                )
+
+        finally:
+            for executor in executors.values():
+                executor.shutdown(wait=True, cancel_futures=True)
+
+        # Report the achieved throughput
+        elapsed = time.perf_counter() - start_time
+        for kind, count in processed.items():
+            rate = count / elapsed if elapsed > 0 else 0.0
+            print(f"Clientes {kind}: {count} procesados en {elapsed:.1f} s ({rate:.2f} RUTs/s)")
+
+        self._finish_workflow(equifax_client, "Equifax", stage=stage)
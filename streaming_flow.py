@@ -0,0 +1,122 @@
+import os
+import time
+from typing import Iterator
+import pandas as pd
+from clients.gesintel_client import get_gestintel_client
+from controllers.gesintel_controller import GesintelController
+from controllers.output_controller import OutputController
+from controllers.input_reader import iter_batches
+from controllers.job_state import build_job_state
+from library.rut import normalize_ruts
+
+
+class StreamingValidationFlow:
+    '''Workflows for customer files too big to be held in memory.
+
+    Unlike ValidationControlFlow, the input is never loaded as a whole: it
+    is read in batches (read-only openpyxl for Excel, chunked readers for
+    CSV/Parquet/Feather) and the results are appended to an output file,
+    so memory stays flat as the input grows. Progress lives in the job
+    state store, so a run can be stopped and resumed at any time.'''
+
+    def __init__(self, input_file: str, batch_size: int = None):
+        self.filename = input_file
+
+        if batch_size is None:
+            batch_size = int(os.getenv("STREAM_BATCH_SIZE", "5000"))
+        self.batch_size = batch_size
+
+        # Per-RUT state of each stage, to resume a run where it stopped
+        self.jobs = build_job_state(input_file)
+
+
+    def _pending_batches(self, stage: str) -> Iterator[tuple[pd.DataFrame, pd.Series]]:
+        '''Yield each batch of the input reduced to the rows that need work
+        in the stage (valid, not repeated and pending), with their keys'''
+
+        for batch in iter_batches(self.filename, self.batch_size, columns=['Rut']):
+            ruts = normalize_ruts(batch['Rut'])
+
+            # Invalid RUTs never reach the providers, repeated ones are billed once
+            keep = ruts['valid'] & ~ruts['key'].duplicated()
+            batch = batch[keep]
+            keys = ruts['key'][keep]
+
+            # The results go to the output, not to the input: new RUTs join
+            # the stage as pending, known ones keep their state
+            self.jobs.seed(stage, keys.tolist())
+            pending = keys.isin(self.jobs.pending_among(stage, keys.tolist()))
+
+            yield batch[pending], keys[pending]
+
+
+    def run_gesintel_watchlist_workflow(self, max_workers: int = None) -> None:
+        '''
+        Streamed version of ValidationControlFlow.run_gesintel_watchlist_workflow.
+        The control columns of each RUT (PEP Ges, Watch Ges, PJ Ges) are
+        appended to output_files/<input> Gesintel.csv instead of being
+        written back to the input file.
+        '''
+
+        # Its own stage: the results of ValidationControlFlow's "gesintel"
+        # stage live in the input, these only in the output
+        stage = "gesintel_stream"
+
+        gesintel_client = get_gestintel_client()
+        controller = GesintelController(gesintel_client)
+
+        if max_workers is None:
+            max_workers = int(os.getenv("GESINTEL_WORKERS", "1"))
+
+        # Output for the control columns
+        name = os.path.splitext(os.path.basename(self.filename))[0]
+        output = OutputController(csv_file=f"{name} Gesintel.csv")
+        output.select_output_format(csv_enabled=True, excel_enabled=False)
+        output.write_headers(["Rut", "PEP Ges", "Watch Ges", "PJ Ges"])
+
+        processed = 0
+        start_time = time.perf_counter()
+
+        for batch, keys in self._pending_batches(stage):
+            if batch.empty:
+                continue
+
+            print(f"Procesando {len(batch)} RUTs pendientes, filas {batch.index[0]} a {batch.index[-1]}")
+
+            # The controller expects the control columns, without results yet
+            block = batch.assign(**{'PEP Ges': "S/I", 'Watch Ges': "S/I", 'PJ Ges': "S/I"})
+            self.jobs.mark_in_flight(stage, keys.tolist())
+
+            updated = {}
+            while True:
+                for index, updated_row in controller.check_watchlists_concurrently(block, max_workers):
+                    updated[index] = updated_row
+
+                if controller.circuit_error is None:
+                    break
+
+                # Gesintel is failing: pause and retry the rest of the batch
+                print(f"{controller.circuit_error}. Pausando la etapa...")
+                time.sleep(max(1.0, controller.circuit_error.retry_after))
+                block = block.drop(index=list(updated))
+
+            output.write_rows([
+                [row['Rut'], row['PEP Ges'], row['Watch Ges'], row['PJ Ges']]
+                for row in updated.values()
+            ])
+
+            for index, key in keys.items():
+                if index in updated:
+                    self.jobs.mark_done(stage, key)
+                else:
+                    self.jobs.mark_failed(stage, key, "sin resultado")
+
+            processed += len(updated)
+
+        # Report the achieved throughput
+        elapsed = time.perf_counter() - start_time
+        rate = processed / elapsed if elapsed > 0 else 0.0
+        print(f"RUTs procesados: {processed} en {elapsed:.1f} s ({rate:.2f} RUTs/s)")
+        self.jobs.print_stats(stage)
+
+        gesintel_client.transport.print_stats("Gesintel")
@@ -2,12 +2,23 @@ from dotenv import load_dotenv
 from clients.equifax_client import get_equifax_client
 from clients.plutto_client import get_plutto_client
 from clients.gesintel_client import get_gestintel_client
+import os
 import json
+import tempfile
+import types
+from unittest import mock
+import pandas as pd
+import clients.plutto_client as plutto_module
+from library.rut import normalize_rut, normalize_ruts, is_valid_rut
 from preparation import ValidationControlFlow
 from library.plutto_components import WatchlistResponse
 from controllers.plutto_controller import PluttoController
 import requests
-from library.gesintel_components import AMLResultResponse
+import time
+import tracemalloc
+from dateutil.parser import parse as parse_date
+import itertools
+from library.gesintel_components import AMLResultResponse, AML_RESULT_ADAPTER, PersonResult, classify_aml_result, classify_aml_report
 
 load_dotenv()
 
@@ -22,6 +33,13 @@ def main():
     # test_plutto_client_validation_by_id()
     # test_plutto_client_watchlists()
     # test_plutto_watchlist_response()
+    # test_plutto_watchlist_benchmark()
+
+    # Test the recovery of a workflow stopped halfway
+    # test_prepare_data_crash_resume()
+
+    # Test the vectorized RUT normalization against the scalar one
+    # test_normalize_ruts_mixed_column()
 
     ######################################
     # Test methods related to GESINTEL
@@ -33,6 +51,8 @@ def main():
     # test_get_flag_results()
     # test_get_entity_data()
     # test_get_entity_record()
+    # test_screen()
+    # test_gesintel_classifier_parity()
 
 
     print("\nThe end")
@@ -207,6 +227,118 @@ def test_get_entity_record():
         print(f"Error en la comunicación con la API Gesintel: {e}")
 
 
+def test_screen():
+    '''Test the concurrent screening over several endpoints'''
+
+    ruts = ["73426464", "765847214"]
+    endpoints = ["getAMLResult", "getAMLRisk", "getFlagResults"]
+
+    try:
+        gesintel_client = get_gestintel_client()
+    
+    except Exception as e:
+        print("Error obteniendo el cliente de GESINTEL")
+        print(f"{str(e)}")
+        return
+
+    start = time.perf_counter()
+    results = gesintel_client.screen_many(ruts, endpoints)
+    elapsed = time.perf_counter() - start
+
+    for result in results:
+        print(f"\nRUT {result.rut}")
+        for endpoint in endpoints:
+            if endpoint in result.errors:
+                print(f"{endpoint}: error {result.errors[endpoint]}")
+            else:
+                print(f"{endpoint}: {'encontrado' if result.found.get(endpoint) else 'no encontrado'}")
+
+    print(f"\nTiempo total: {elapsed:.2f} s para {len(ruts)} RUTs")
+
+
+def _legacy_aml_flags(report: AMLResultResponse) -> tuple:
+    '''Hit vector and flags as GesintelController computed them over the
+    pydantic model, before the fast classifier'''
+
+    results = report.results
+    hits = ["No"] * 11
+    pep = watchlist = pj = False
+
+    for column, name in [(0, "pepCResults"), (1, "pepHResults"), (2, "pepCResults"), (3, "fpResults"),
+                         (8, "vipResults"), (9, "pepRelacionados"), (10, "pepHRelacionados")]:
+        if getattr(results, name):
+            hits[column] = "Si"
+            pep = True
+
+    if results.pjudResults:
+        hits[4] = "Si"
+        pj = True
+
+    for column, name in [(5, "personResults"), (7, "negativeResults")]:
+        if getattr(results, name):
+            hits[column] = "Si"
+            watchlist = True
+
+    dj = results.djResults
+    if dj:
+        if ('wlResults' in dj and dj['wlResults'] is not None and len(dj['wlResults']) > 0) or \
+                ('ameResults' in dj and dj['ameResults'] is not None and len(dj['ameResults']) > 0):
+            hits[6] = "Si"
+            watchlist = True
+        if 'socResults' in dj and dj['socResults'] is not None and len(dj['socResults']) > 0:
+            hits[6] = "Si"
+            pep = True
+
+    return hits, pep, watchlist, pj
+
+
+def test_gesintel_classifier_parity():
+    '''Check that the fast getAMLResult classifier gives the same hit vector
+    and flags as the pydantic model, over every combination of result lists'''
+
+    person = {name: None for name in PersonResult.model_fields}
+    lists = ["pepResults", "pepHResults", "pepCResults", "fpResults", "pjudResults", "personResults",
+             "negativeResults", "vipResults", "pepRelacionados", "pepHRelacionados"]
+    dj_variants = [None, {}, {"wlResults": []}, {"wlResults": [{}]}, {"ameResults": [{}]},
+                   {"socResults": [{}]}, {"wlResults": None, "socResults": [{}], "ameResults": [{}]}]
+
+    checked = 0
+    mismatches = 0
+    start = time.perf_counter()
+    fast_time = 0.0
+    model_time = 0.0
+
+    for present in itertools.product([False, True], repeat=len(lists)):
+        for dj in dj_variants:
+            results = {
+                name: ([{"id": "1"}] if name == "pjudResults" else [dict(person)]) if flag else []
+                for name, flag in zip(lists, present)
+            }
+            results["djResults"] = dj
+            response = {"status": "OK", "message": None, "results": results}
+
+            fast_start = time.perf_counter()
+            fast = classify_aml_result(response)
+            fast_time += time.perf_counter() - fast_start
+
+            model_start = time.perf_counter()
+            report = AMLResultResponse.model_validate(response)
+            model_time += time.perf_counter() - model_start
+
+            audited = classify_aml_report(report)
+            from_bytes = classify_aml_report(AML_RESULT_ADAPTER.validate_json(json.dumps(response)))
+            legacy = _legacy_aml_flags(report)
+
+            checked += 1
+            if fast != audited or fast != from_bytes or (fast.hits, fast.pep, fast.watchlist, fast.pj) != legacy:
+                mismatches += 1
+                print(f"Diferencia en {response}: {fast} / {audited} / {legacy}")
+
+    print(f"Clasificador de getAMLResult: {checked} respuestas, {mismatches} diferencias "
+          f"({time.perf_counter() - start:.1f} s)")
+    print(f"Ruta rápida: {fast_time * 1000:.1f} ms, validación pydantic: {model_time * 1000:.1f} ms")
+
+
 #############################################################
 #
 # Start Plutto tests
@@ -234,6 +366,285 @@ def test_plutto_watchlist_response():
         print(f"Número de hits: {hits}")
 
 
+def _sample_watchlist_payload(number: int) -> dict:
+    '''Synthetic watchlist answer with the shape Plutto returns'''
+
+    timestamp = f"2024-05-{number % 28 + 1:02d}T10:15:30.123Z"
+
+    list_matches = [
+        {
+            "id": f"lm_{number}_{match}",
+            "hit_id": f"hit_{number}",
+            "date": "2021-03-15",
+            "category": "PEP" if match == 0 else "Sanction",
+            "source": "OFAC",
+            "listing": "SDN",
+            "program": "PEP" if match == 0 else "SDGT",
+            "remarks": "Sin observaciones",
+            "country": "CL",
+            "position": "Director",
+            "created_at": timestamp,
+            "updated_at": timestamp,
+            "false_positive": False,
+            "type": "person"
+        }
+        for match in range(4)
+    ]
+
+    hits = [
+        {
+            "id": f"hit_{number}_{hit}",
+            "full_name": f"Persona {number} {hit}",
+            "match_types": ["name"],
+            "list_types": ["pep", "sanction"],
+            "score": 0.92,
+            "risk_level": "high",
+            "hit_type": "person",
+            "countries": ["CL"],
+            "list_matches": list_matches
+        }
+        for hit in range(3)
+    ]
+
+    return {
+        "watchlists": [
+            {
+                "id": f"wl_{number}",
+                "total_hits": len(hits),
+                "total_blacklist_hits": 1,
+                "total_matches": len(hits) * len(list_matches),
+                "risk_level": "high",
+                "watchlistable_name": f"Comercio {number}",
+                "source": "plutto",
+                "created_at": timestamp,
+                "updated_at": timestamp,
+                "hits": hits
+            }
+        ]
+    }
+
+
+class _EagerListMatch:
+    '''Baseline for the benchmark: the list match of the model before it
+    was made lazy, every date parsed with dateutil on creation'''
+
+    def __init__(self, data: dict):
+        self.id = data.get('id')
+        self.hit_id = data.get('hit_id')
+        self.date = parse_date(data['date']).date() if data.get('date') else None
+        self.category = data.get('category')
+        self.source = data.get('source')
+        self.listing = data.get('listing')
+        self.program = data.get('program')
+        self.remarks = data.get('remarks')
+        self.country = data.get('country')
+        self.position = data.get('position')
+        self.created_at = parse_date(data['created_at']) if data.get('created_at') else None
+        self.updated_at = parse_date(data['updated_at']) if data.get('updated_at') else None
+        self.false_positive = data.get('false_positive', False)
+        self.false_positive_by_id = data.get('false_positive_by_id')
+        self.type = data.get('type')
+
+
+class _EagerHit:
+    '''Baseline for the benchmark: hit with every list match built on creation'''
+
+    def __init__(self, data: dict):
+        self.id = data.get('id')
+        self.full_name = data.get('full_name')
+        self.match_types = data.get('match_types', [])
+        self.list_types = data.get('list_types', [])
+        self.score = data.get('score', 0.0)
+        self.risk_level = data.get('risk_level')
+        self.hit_type = data.get('hit_type')
+        self.countries = data.get('countries', [])
+        self.list_matches = [_EagerListMatch(match) for match in data.get('list_matches', [])]
+
+
+class _EagerWatchlist:
+    '''Baseline for the benchmark: watchlist with every hit and date built on creation'''
+
+    def __init__(self, data: dict):
+        self.id = data.get('id')
+        self.total_hits = data.get('total_hits', 0)
+        self.total_blacklist_hits = data.get('total_blacklist_hits', 0)
+        self.total_matches = data.get('total_matches', 0)
+        self.share_url = data.get('share_url')
+        self.risk_level = data.get('risk_level')
+        self.watchlistable_name = data.get('watchlistable_name')
+        self.source = data.get('source')
+        self.created_at = parse_date(data['created_at']) if data.get('created_at') else None
+        self.updated_at = parse_date(data['updated_at']) if data.get('updated_at') else None
+        self.entity_validation_id = data.get('entity_validation_id')
+        self.entity_validation_tin = data.get('entity_validation_tin')
+        self.hits = [_EagerHit(hit) for hit in data.get('hits', [])]
+
+
+class _EagerWatchlistResponse:
+    '''Baseline for the benchmark: the eager WatchlistResponse'''
+
+    def __init__(self, data: dict):
+        self.watchlists = [_EagerWatchlist(wl) for wl in data.get('watchlists', [])]
+
+
+def test_plutto_watchlist_benchmark():
+    '''Time and peak memory of the watchlist model per 1,000 payloads: the
+    eager baseline (every child and date built with dateutil on creation)
+    against the lazy model, reading only what PluttoController reads and
+    reading every child and date'''
+
+    payloads = [_sample_watchlist_payload(number) for number in range(1000)]
+
+    def controller_fields(response):
+        # What PluttoController reads: totals, names, categories and programs
+        for watchlist in response.watchlists:
+            watchlist.total_blacklist_hits, watchlist.watchlistable_name
+            for hit in watchlist.hits:
+                hit.full_name, hit.hit_type, hit.risk_level
+                for match in hit.list_matches:
+                    match.category, match.program, match.source, match.remarks
+
+    def every_field(response):
+        controller_fields(response)
+        for watchlist in response.watchlists:
+            watchlist.created_at, watchlist.updated_at
+            for hit in watchlist.hits:
+                for match in hit.list_matches:
+                    match.date, match.created_at, match.updated_at
+
+    def build(model, read):
+        responses = [model(payload) for payload in payloads]
+        for response in responses:
+            read(response)
+        return responses
+
+    def measure(label, model, read):
+        # Timed without tracemalloc, which slows the allocations down
+        start = time.perf_counter()
+        build(model, read)
+        elapsed = time.perf_counter() - start
+
+        tracemalloc.start()
+        build(model, read)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(f"{label}: {elapsed * 1000:.1f} ms, pico de memoria {peak / 1024:.0f} KiB")
+        return elapsed, peak
+
+    print("Benchmark del modelo de watchlists (1.000 respuestas)")
+    base_time, base_peak = measure("Modelo anterior (todo al crear, dateutil)", _EagerWatchlistResponse, controller_fields)
+    lazy_time, lazy_peak = measure("Modelo perezoso, campos del controlador", WatchlistResponse, controller_fields)
+    full_time, full_peak = measure("Modelo perezoso, todos los campos y fechas", WatchlistResponse, every_field)
+
+    print(
+        f"Campos del controlador: {base_time / lazy_time:.1f}x más rápido, "
+        f"{lazy_peak / base_peak * 100:.0f}% de la memoria del modelo anterior"
+    )
+    print(
+        f"Todos los campos: {base_time / full_time:.1f}x más rápido, "
+        f"{full_peak / base_peak * 100:.0f}% de la memoria del modelo anterior"
+    )
+
+    # The controller path must beat the baseline on both counts
+    assert lazy_time < base_time, (lazy_time, base_time)
+    assert lazy_peak < base_peak, (lazy_peak, base_peak)
+
+
+class _SimulatedCrash(BaseException):
+    '''Stops a workflow like a killed process: the workflows only catch Exception'''
+
+
+class _FakePluttoClient:
+    '''Plutto client that finds an existing report for every RUT, and
+    crashes once crash_after reports have been obtained'''
+
+    def __init__(self, crash_after: int = None):
+        self.crash_after = crash_after
+        self.calls = []
+        self.transport = types.SimpleNamespace(print_stats=lambda name: None)
+
+    def obtain_validation_by_tin(self, rut: str):
+        if self.crash_after is not None and len(self.calls) >= self.crash_after:
+            raise _SimulatedCrash()
+
+        self.calls.append(rut)
+        return True, {"entity_validation": {"id": f"evl_{rut}"}}
+
+
+def test_prepare_data_crash_resume():
+    '''prepare_data crashes after two RUTs of four. The restart must
+    recover those two from the journal, call Plutto for the other two only,
+    and save the Id of the four'''
+
+    ruts = ["76431161-2", "12345678-5", "11111111-1", "5126663-3"]
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "clientes.csv")
+        pd.DataFrame({"Rut": ruts}).to_csv(path, index=False)
+
+        environment = {
+            "JOB_STATE_FILE": f"{path}.jobs.sqlite",
+            "CHECKPOINT_JOURNAL": f"{path}.journal.jsonl"
+        }
+
+        with mock.patch.dict(os.environ, environment):
+            # First run: stops in the middle, nothing is saved to the file
+            first = _FakePluttoClient(crash_after=2)
+            plutto_module._plutto_client_instance = first
+            flow = ValidationControlFlow(path)
+            try:
+                flow.prepare_data()
+                raise AssertionError("La primera ejecución debía caerse")
+            except _SimulatedCrash:
+                pass
+            finally:
+                flow.journal.close()
+                flow.jobs.close()
+
+            assert first.calls == ruts[:2], first.calls
+
+            # Restart: the journal brings back the two finished rows
+            second = _FakePluttoClient()
+            plutto_module._plutto_client_instance = second
+            try:
+                flow = ValidationControlFlow(path)
+                flow.prepare_data()
+                flow.jobs.close()
+            finally:
+                plutto_module._plutto_client_instance = None
+
+        assert second.calls == ruts[2:], second.calls
+
+        saved = pd.read_csv(path, dtype=str)
+        assert saved["Id"].tolist() == [f"evl_{rut}" for rut in ruts], saved["Id"].tolist()
+
+    print("Recuperación tras una caída: OK")
+
+
+def test_normalize_ruts_mixed_column():
+    '''normalize_ruts must give the same key and validity as normalize_rut
+    and is_valid_rut, also for the floats Excel leaves in a text column'''
+
+    columns = {
+        "mixta": pd.Series(
+            [764311612.0, "76.431.161-2", "764311612.0", 123456785.0, "11111111-1",
+             51266633, "12.345.678-5", 123456780.0, "abc"],
+            dtype=object
+        ),
+        "numérica": pd.Series([764311612.0, 123456785.0, 51266633.0, 123456780.0])
+    }
+
+    for name, column in columns.items():
+        ruts = normalize_ruts(column)
+        for index, value in column.items():
+            expected = (normalize_rut(value), is_valid_rut(value))
+            obtained = (ruts.at[index, 'key'], bool(ruts.at[index, 'valid']))
+            assert obtained == expected, (name, value, obtained, expected)
+
+    print("Normalización de RUTs en columnas mixtas: OK")
+
+
 def test_plutto_client_by_tin():
     '''Test Validation by TIN endpoint'''
     